@@ -0,0 +1,54 @@
+import logging
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.exception_handlers import request_validation_exception_handler
+from fastapi.exceptions import RequestValidationError
+
+logger = logging.getLogger(__name__)
+
+REQUEST_ID_HEADER = "X-Request-ID"
+
+
+def new_request_id(candidate: str | None = None) -> str:
+    """Return the client's request id if it is sensible, else a fresh one."""
+    if candidate and len(candidate) <= 128 and candidate.isprintable():
+        return candidate
+    return uuid.uuid4().hex
+
+
+def create_api() -> FastAPI:
+    """Build the HTTP/WebSocket API that app.py mounts the Gradio UI onto."""
+    # Routers import new_request_id from here
+    from api.openai_compat import error_response, router as openai_router
+    from api.synthesis import router as synthesis_router
+
+    api = FastAPI(title="TTS Studio API", docs_url="/api/docs", openapi_url="/api/openapi.json")
+
+    # Every response carries a request id: the client's X-Request-ID if sent, else a new one
+    @api.middleware("http")
+    async def request_id(request: Request, call_next):
+        request.state.request_id = new_request_id(request.headers.get(REQUEST_ID_HEADER))
+        start = time.monotonic()
+        response = await call_next(request)
+        response.headers[REQUEST_ID_HEADER] = request.state.request_id
+        if request.url.path.startswith(("/api/", "/v1/")):
+            logger.info(
+                "%s %s %s %d %.0fms", request.state.request_id, request.method, request.url.path,
+                response.status_code, (time.monotonic() - start) * 1000,
+            )
+        return response
+
+    # OpenAI clients expect their own error shape, with status 400 for bad requests
+    @api.exception_handler(RequestValidationError)
+    async def validation_error(request: Request, exc: RequestValidationError):
+        if request.url.path.startswith("/v1/"):
+            first = exc.errors()[0] if exc.errors() else {}
+            param = str(first.get("loc", ["", ""])[-1]) or None
+            return error_response(400, first.get("msg", "Invalid request."), param)
+        return await request_validation_exception_handler(request, exc)
+
+    api.include_router(synthesis_router)
+    api.include_router(openai_router)
+    return api
@@ -0,0 +1,125 @@
+import base64
+import json
+from typing import Iterator
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel
+
+from api.synthesis import pcm_stream, start_stream
+from config import (
+    MODEL_VOICES, OPENAI_MODELS, OPENAI_VOICES, STANDARD_MODEL_NAMES, get_sample_rate, is_custom_voice_model,
+)
+from services.audio_encoder import encode_stream, encoder_available
+from services.tts_engine import stream_speech
+
+router = APIRouter(prefix="/v1", tags=["openai"])
+
+# response_format -> (audio_encoder format, or None for PCM/WAV, media type)
+RESPONSE_FORMATS = {
+    "mp3": ("MP3", "audio/mpeg"),
+    "opus": ("Opus", "audio/ogg"),
+    "aac": ("AAC", "audio/aac"),
+    "flac": ("FLAC", "audio/flac"),
+    "wav": (None, "audio/wav"),
+    "pcm": (None, "audio/pcm"),
+}
+
+# OpenAI accepts 0.25-4.0; the local models only go this far
+_MIN_SPEED = 0.5
+_MAX_SPEED = 2.0
+
+
+class SpeechRequest(BaseModel):
+    model: str
+    input: str
+    voice: str
+    instructions: str = ""
+    response_format: str = "mp3"
+    speed: float = 1.0
+    stream_format: str = "audio"
+
+
+def error_response(status: int, message: str, param: str | None = None) -> JSONResponse:
+    """Return an error in the OpenAI API's shape."""
+    return JSONResponse(
+        status_code=status,
+        content={"error": {
+            "message": message,
+            "type": "invalid_request_error" if status < 500 else "server_error",
+            "param": param,
+            "code": None,
+        }},
+    )
+
+
+@router.get("/models")
+def list_models() -> dict:
+    """List the model names /v1/audio/speech accepts."""
+    names = list(OPENAI_MODELS) + STANDARD_MODEL_NAMES
+    return {
+        "object": "list",
+        "data": [{"id": name, "object": "model", "created": 0, "owned_by": "tts-studio"} for name in names],
+    }
+
+
+@router.post("/audio/speech")
+def create_speech(req: SpeechRequest) -> Response:
+    """OpenAI-compatible text to speech, streaming audio in response_format as it is generated.
+
+    OpenAI model and voice names are mapped through OPENAI_MODELS and
+    OPENAI_VOICES; local model and voice names are accepted as-is.
+    Synthesis goes through the shared scheduler like every other request.
+    """
+    model = OPENAI_MODELS.get(req.model, req.model)
+    if model not in STANDARD_MODEL_NAMES:
+        return error_response(400, f"Model '{req.model}' is not supported.", "model")
+    voice = resolve_voice(req.voice, model)
+    if voice is None:
+        return error_response(400, f"Voice '{req.voice}' is not available for model '{req.model}'.", "voice")
+    if not req.input.strip():
+        return error_response(400, "Input cannot be empty.", "input")
+    if req.response_format not in RESPONSE_FORMATS:
+        return error_response(
+            400, f"response_format must be one of {', '.join(RESPONSE_FORMATS)}.", "response_format",
+        )
+    if req.stream_format not in ("audio", "sse"):
+        return error_response(400, "stream_format must be 'audio' or 'sse'.", "stream_format")
+    encoding, media_type = RESPONSE_FORMATS[req.response_format]
+    if encoding and not encoder_available(encoding):
+        return error_response(500, f"Encoding {req.response_format} needs ffmpeg, which is not installed.")
+
+    speed = min(max(req.speed, _MIN_SPEED), _MAX_SPEED)
+    instruct = req.instructions if is_custom_voice_model(model) else ""
+    try:
+        chunks = start_stream((model, stream_speech, (req.input, model, voice, speed), {"instruct": instruct}))
+    except HTTPException as e:
+        return error_response(e.status_code, e.detail, "input" if e.status_code == 400 else None)
+
+    sample_rate = get_sample_rate(model)
+    if encoding:
+        body = encode_stream(chunks, encoding, sample_rate)
+    else:
+        body = pcm_stream(chunks, sample_rate, req.response_format)
+    if req.stream_format == "sse":
+        return StreamingResponse(_sse_events(body), media_type="text/event-stream")
+    return StreamingResponse(body, media_type=media_type, headers={"X-Sample-Rate": str(sample_rate)})
+
+
+def resolve_voice(voice: str, model: str) -> str | None:
+    """Map an OpenAI voice name (or a local one) to a preset voice of `model`."""
+    available = MODEL_VOICES.get(model, [])
+    if voice in available:
+        return voice
+    for candidate in OPENAI_VOICES.get(voice.lower(), []):
+        if candidate in available:
+            return candidate
+    return None
+
+
+def _sse_events(body: Iterator[bytes]) -> Iterator[str]:
+    """Wrap audio bytes in speech.audio.delta server-sent events, as OpenAI's stream_format=sse does."""
+    for data in body:
+        event = {"type": "speech.audio.delta", "audio": base64.b64encode(data).decode("ascii")}
+        yield f"data: {json.dumps(event)}\n\n"
+    yield f"data: {json.dumps({'type': 'speech.audio.done'})}\n\n"
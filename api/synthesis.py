@@ -0,0 +1,318 @@
+import logging
+import os
+import shutil
+import tempfile
+from typing import Iterator, Literal
+
+from fastapi import APIRouter, File, Form, HTTPException, UploadFile, WebSocket, WebSocketDisconnect
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
+
+from api import new_request_id
+from config import (
+    CLONING_MODEL_NAMES, DIALOGUE_MODEL_NAMES, MODELS, MODEL_VOICES, QWEN3_VOICE_LIST, STANDARD_MODEL_NAMES,
+    UPLOADS_DIR, VOICE_DESIGN_MODEL_NAMES, get_sample_rate,
+)
+from services.audio_utils import pcm16_bytes, prepare_reference, register_reference, wav_header
+from services.model_manager import manager
+from services.scheduler import scheduler, PRIORITY_INTERACTIVE
+from services.tts_engine import stream_clone, stream_dialogue, stream_speech, stream_voice_design
+from services.voice_library import find_voice, list_voices
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api", tags=["synthesis"])
+
+MEDIA_TYPES = {"wav": "audio/wav", "pcm": "audio/L16"}
+
+AudioFormat = Literal["wav", "pcm"]
+
+
+class SpeechRequest(BaseModel):
+    text: str = Field(min_length=1)
+    model: str = STANDARD_MODEL_NAMES[0]
+    voice: str = MODEL_VOICES[STANDARD_MODEL_NAMES[0]][0]
+    speed: float = Field(1.0, ge=0.5, le=2.0)
+    instruct: str = ""
+    format: AudioFormat = "wav"
+    stream: bool = True
+
+
+class VoiceDesignRequest(BaseModel):
+    text: str = Field(min_length=1)
+    instruct: str = Field(min_length=1, description="Description of the voice")
+    model: str = VOICE_DESIGN_MODEL_NAMES[0]
+    language: str = "auto"
+    format: AudioFormat = "wav"
+    stream: bool = True
+
+
+class DialogueRequest(BaseModel):
+    text: str = Field(min_length=1, description="Script with [S1]/[S2] speaker tags")
+    model: str = DIALOGUE_MODEL_NAMES[0]
+    format: AudioFormat = "wav"
+    stream: bool = True
+
+
+class SavedVoiceCloneRequest(BaseModel):
+    """Cloning request over the WebSocket, where only saved voices can be used."""
+    text: str = Field(min_length=1)
+    saved_voice: str
+    model: str | None = None
+    voice: str | None = None
+    instruct: str = ""
+
+
+# A synthesis job for the scheduler: (model name, stream_* function, args, kwargs)
+Job = tuple[str, object, tuple, dict]
+
+
+# ── Endpoints ─────────────────────────────────────────────────────────────
+
+
+@router.get("/models")
+def models() -> dict:
+    """List the models with their preset voices and sample rates."""
+    return {
+        name: {
+            "description": m["description"],
+            "supports_cloning": m["supports_cloning"],
+            "voices": MODEL_VOICES.get(name, []),
+            "sample_rate": get_sample_rate(name),
+            "loaded": manager.is_loaded(name),
+        }
+        for name, m in MODELS.items()
+    }
+
+
+@router.get("/voices")
+def voices() -> list[dict]:
+    """List the saved (cloned) voices."""
+    return [
+        {"name": v["name"], "model": v.get("model"), "base_voice": v.get("base_voice")}
+        for v in list_voices()
+    ]
+
+
+@router.post("/speech")
+def speech(req: SpeechRequest) -> Response:
+    """Synthesize text with a preset voice (the Quick TTS tab)."""
+    return _audio_response(_speech_job(req), req.format, req.stream)
+
+
+@router.post("/clone")
+def clone(
+    text: str = Form(..., min_length=1),
+    ref_audio: UploadFile | None = File(None, description="Reference clip; or use saved_voice"),
+    ref_text: str = Form(""),
+    saved_voice: str | None = Form(None),
+    model: str | None = Form(None),
+    voice: str | None = Form(None, description="Base speaker (CustomVoice models)"),
+    instruct: str = Form(""),
+    format: AudioFormat = Form("wav"),
+    stream: bool = Form(True),
+) -> Response:
+    """Synthesize text in a cloned voice, from an uploaded clip or a saved voice."""
+    if saved_voice:
+        job = _saved_voice_job(SavedVoiceCloneRequest(
+            text=text, saved_voice=saved_voice, model=model, voice=voice, instruct=instruct,
+        ))
+    elif ref_audio is not None:
+        ref_path = _store_reference(ref_audio)
+        job = _clone_job(text, model or CLONING_MODEL_NAMES[0], ref_path, ref_text, voice, instruct)
+    else:
+        raise HTTPException(400, "Either ref_audio or saved_voice is required.")
+    return _audio_response(job, format, stream)
+
+
+@router.post("/voice-design")
+def voice_design(req: VoiceDesignRequest) -> Response:
+    """Synthesize text with a voice designed from a description."""
+    return _audio_response(_design_job(req), req.format, req.stream)
+
+
+@router.post("/dialogue")
+def dialogue(req: DialogueRequest) -> Response:
+    """Synthesize a multi-speaker [S1]/[S2] script."""
+    return _audio_response(_dialogue_job(req), req.format, req.stream)
+
+
+@router.websocket("/ws")
+async def synthesis_socket(websocket: WebSocket) -> None:
+    """Run any number of synthesis requests over one connection.
+
+    Each request is a JSON object with a "type" of speech, clone (saved
+    voices only), voice-design or dialogue plus the matching endpoint's
+    fields, and an optional "request_id". The reply is a JSON "start" event
+    with the sample rate, binary frames of 16-bit mono PCM as the audio is
+    generated, and a JSON "done" event (or an "error" event).
+    """
+    await websocket.accept()
+    try:
+        while True:
+            try:
+                message = await websocket.receive_json()
+            except ValueError:
+                await websocket.send_json({"event": "error", "request_id": None, "detail": "Invalid JSON."})
+                continue
+            if not isinstance(message, dict):
+                message = {}
+            request_id = new_request_id(message.pop("request_id", None))
+            try:
+                job = _socket_job(message)
+                await _stream_to_socket(websocket, job, request_id)
+            except (HTTPException, ValidationError, ValueError) as e:
+                detail = e.detail if isinstance(e, HTTPException) else str(e)
+                await websocket.send_json({"event": "error", "request_id": request_id, "detail": detail})
+            except WebSocketDisconnect:
+                raise
+            except Exception as e:
+                logger.exception("%s: synthesis failed", request_id)
+                await websocket.send_json({"event": "error", "request_id": request_id, "detail": str(e)})
+    except WebSocketDisconnect:
+        pass
+
+
+# ── Jobs ──────────────────────────────────────────────────────────────────
+
+
+def _speech_job(req: SpeechRequest) -> Job:
+    _check_model(req.model, STANDARD_MODEL_NAMES)
+    if req.voice not in MODEL_VOICES.get(req.model, []):
+        raise HTTPException(400, f"Voice '{req.voice}' is not available for {req.model}.")
+    return req.model, stream_speech, (req.text, req.model, req.voice, req.speed), {"instruct": req.instruct}
+
+
+def _clone_job(text: str, model: str, ref_path: str, ref_text: str, voice: str | None, instruct: str) -> Job:
+    _check_model(model, CLONING_MODEL_NAMES)
+    return (
+        model, stream_clone, (text, model, ref_path, ref_text),
+        {"voice": voice or QWEN3_VOICE_LIST[0], "instruct": instruct},
+    )
+
+
+def _saved_voice_job(req: SavedVoiceCloneRequest) -> Job:
+    try:
+        data = find_voice(req.saved_voice)
+    except FileNotFoundError:
+        raise HTTPException(404, f"Saved voice '{req.saved_voice}' not found.") from None
+    return _clone_job(
+        req.text, req.model or data.get("model", CLONING_MODEL_NAMES[0]), data["ref_audio_path"],
+        data.get("ref_text", ""), req.voice or data.get("base_voice"), req.instruct,
+    )
+
+
+def _design_job(req: VoiceDesignRequest) -> Job:
+    _check_model(req.model, VOICE_DESIGN_MODEL_NAMES)
+    return req.model, stream_voice_design, (req.text, req.model, req.language, req.instruct), {}
+
+
+def _dialogue_job(req: DialogueRequest) -> Job:
+    _check_model(req.model, DIALOGUE_MODEL_NAMES)
+    return req.model, stream_dialogue, (req.text, req.model), {}
+
+
+def _socket_job(message: dict) -> Job:
+    kind = message.pop("type", "speech")
+    if kind == "speech":
+        return _speech_job(SpeechRequest(**message))
+    if kind == "clone":
+        return _saved_voice_job(SavedVoiceCloneRequest(**message))
+    if kind == "voice-design":
+        return _design_job(VoiceDesignRequest(**message))
+    if kind == "dialogue":
+        return _dialogue_job(DialogueRequest(**message))
+    raise HTTPException(400, f"Unknown request type '{kind}'.")
+
+
+def _check_model(model: str, allowed: list[str]) -> None:
+    if model not in allowed:
+        raise HTTPException(400, f"Model '{model}' is not available here; choose one of {', '.join(allowed)}.")
+
+
+def _store_reference(upload: UploadFile) -> str:
+    """Normalize an uploaded reference clip into the reference cache and return its path."""
+    suffix = os.path.splitext(upload.filename or "")[1] or ".wav"
+    with tempfile.NamedTemporaryFile(dir=UPLOADS_DIR, suffix=suffix, delete=False) as tmp:
+        shutil.copyfileobj(upload.file, tmp)
+    try:
+        ref_hash, ref_path = prepare_reference(tmp.name)
+    except Exception as e:
+        raise HTTPException(400, f"Could not read reference audio: {e}") from None
+    finally:
+        os.remove(tmp.name)
+    # Lets stream_clone() use the normalized copy without hashing it again
+    register_reference(ref_path, ref_hash)
+    return ref_path
+
+
+# ── Audio responses ───────────────────────────────────────────────────────
+
+
+def start_stream(job: Job, priority: int = PRIORITY_INTERACTIVE) -> Iterator:
+    """Submit a job through the scheduler and wait for its first chunk.
+
+    Bad input and model failures therefore raise here, before any response
+    is sent, instead of truncating a stream. Returns an iterator over all
+    chunks (the first included).
+    """
+    model_name, fn, args, kwargs = job
+    chunks = scheduler.stream(model_name, priority, fn, *args, **kwargs)
+    try:
+        first = next(chunks)
+    except StopIteration:
+        raise HTTPException(500, "Model produced no audio output.") from None
+    except ValueError as e:
+        raise HTTPException(400, str(e)) from None
+    return _prepend(first, chunks)
+
+
+def _prepend(first, rest: Iterator) -> Iterator:
+    """Yield first and then rest; closing this closes rest, releasing its scheduler slot."""
+    try:
+        yield first
+        yield from rest
+    finally:
+        rest.close()
+
+
+def _audio_response(job: Job, audio_format: str, stream: bool) -> Response:
+    """Return the job's audio as WAV or raw PCM, streamed as it is generated or all at once."""
+    sample_rate = get_sample_rate(job[0])
+    chunks = start_stream(job)
+    headers = {"X-Sample-Rate": str(sample_rate)}
+    if stream:
+        return StreamingResponse(
+            pcm_stream(chunks, sample_rate, audio_format), media_type=MEDIA_TYPES[audio_format], headers=headers,
+        )
+
+    pcm = b"".join(pcm16_bytes(c) for c in chunks)
+    if audio_format == "wav":
+        pcm = wav_header(sample_rate, len(pcm) // 2) + pcm
+    return Response(pcm, media_type=MEDIA_TYPES[audio_format], headers=headers)
+
+
+def pcm_stream(chunks: Iterator, sample_rate: int, audio_format: str) -> Iterator[bytes]:
+    """Yield 16-bit PCM bytes per chunk, after a streaming WAV header for "wav"."""
+    if audio_format == "wav":
+        yield wav_header(sample_rate)
+    for chunk in chunks:
+        yield pcm16_bytes(chunk)
+
+
+async def _stream_to_socket(websocket: WebSocket, job: Job, request_id: str) -> None:
+    sample_rate = get_sample_rate(job[0])
+    chunks = await run_in_threadpool(start_stream, job)
+    await websocket.send_json({
+        "event": "start", "request_id": request_id, "sample_rate": sample_rate, "format": "pcm_s16le",
+    })
+    frames = 0
+    try:
+        async for chunk in iterate_in_threadpool(chunks):
+            data = pcm16_bytes(chunk)
+            frames += len(data) // 2
+            await websocket.send_bytes(data)
+    finally:
+        chunks.close()
+    await websocket.send_json({"event": "done", "request_id": request_id, "frames": frames})
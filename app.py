@@ -1,6 +1,10 @@
 import gradio as gr
+import uvicorn
 
+from api import create_api
+from config import API_KEEP_ALIVE_S
 from services.audio_utils import check_ffmpeg
+from services.tts_engine import start_prewarm
 from ui.quick_tts_tab import create_quick_tts_tab
 from ui.voice_clone_tab import create_voice_clone_tab
 from ui.voice_design_tab import create_voice_design_tab
@@ -10,6 +14,8 @@ from ui.batch_compare_tab import create_batch_compare_tab
 
 
 def main():
+    start_prewarm()
+
     with gr.Blocks(title="TTS Studio") as app:
         gr.Markdown("# TTS Studio")
         gr.Markdown("Local text-to-speech powered by MLX-Audio on Apple Silicon.")
@@ -29,7 +35,9 @@ def main():
             create_audiobook_tab()
             create_batch_compare_tab()
 
-    app.launch(server_name="0.0.0.0", server_port=7860, theme=gr.themes.Soft())
+    # The UI is served at / and the HTTP/WebSocket API under /api on the same port
+    server = gr.mount_gradio_app(create_api(), app, path="/", theme=gr.themes.Soft())
+    uvicorn.run(server, host="0.0.0.0", port=7860, timeout_keep_alive=API_KEEP_ALIVE_S)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,79 @@
+import time
+import zlib
+from types import SimpleNamespace
+from typing import Callable, Iterator
+
+import numpy as np
+
+from config import DEFAULT_SAMPLE_RATE
+
+
+class FakeModel:
+    """Deterministic stand-in for an mlx-audio TTS model.
+
+    Speaks `chars_per_second` characters of text per second of audio, as a
+    tone whose pitch depends on the text, in chunks of `chunk_seconds`, and
+    sleeps to generate at real-time factor `rtf` (0.1 = ten times faster than
+    real time). The same text always yields the same samples, so runs on
+    different commits do identical work. `on_chunk` is called with every
+    chunk as it is produced.
+
+    Like the mlx-audio models, it has no batch_generate(); BatchingFakeModel
+    adds one.
+    """
+
+    def __init__(
+        self,
+        sample_rate: int = DEFAULT_SAMPLE_RATE,
+        rtf: float = 0.05,
+        chars_per_second: float = 15.0,
+        chunk_seconds: float = 2.0,
+        on_chunk: Callable[[np.ndarray], None] | None = None,
+    ):
+        self.sample_rate = sample_rate
+        self._rtf = rtf
+        self._chars_per_second = chars_per_second
+        self._chunk_frames = max(1, int(chunk_seconds * sample_rate))
+        self._on_chunk = on_chunk
+
+    def generate(self, text: str, **kwargs) -> Iterator[SimpleNamespace]:
+        for audio in self._chunks(text):
+            self._compute([audio])
+            yield SimpleNamespace(audio=audio)
+
+    def _chunks(self, text: str) -> Iterator[np.ndarray]:
+        total = max(1, round(len(text) / self._chars_per_second * self.sample_rate))
+        freq = 110.0 + zlib.crc32(text.encode("utf-8")) % 330
+        step = 2 * np.pi * freq / self.sample_rate
+        for start in range(0, total, self._chunk_frames):
+            frames = np.arange(start, min(start + self._chunk_frames, total))
+            yield (0.1 * np.sin(frames * step)).astype(np.float32)
+
+    def _compute(self, step: list[np.ndarray]) -> None:
+        """Simulate one forward pass producing `step` (its cost is set by the longest chunk)."""
+        if self._rtf > 0:
+            time.sleep(max(len(a) for a in step) / self.sample_rate * self._rtf)
+        if self._on_chunk is not None:
+            for audio in step:
+                self._on_chunk(audio)
+
+
+class BatchingFakeModel(FakeModel):
+    """FakeModel for a backend that can render several texts in one forward pass."""
+
+    def batch_generate(self, texts: list[str], **kwargs) -> Iterator[SimpleNamespace]:
+        """Render texts in lockstep, paying each step's delay once for the whole batch."""
+        streams = [self._chunks(text) for text in texts]
+        while True:
+            step = []
+            for idx, stream in enumerate(streams):
+                audio = next(stream, None) if stream is not None else None
+                if audio is None:
+                    streams[idx] = None
+                else:
+                    step.append((idx, audio))
+            if not step:
+                return
+            self._compute([audio for _, audio in step])
+            for idx, audio in step:
+                yield SimpleNamespace(audio=audio, batch_idx=idx)
@@ -0,0 +1,234 @@
+"""Benchmark synthesis throughput and latency without MLX, using a deterministic fake model.
+
+    python -m benchmarks.run
+    python -m benchmarks.run --scenarios quick_tts audiobook --repeat 3
+    python -m benchmarks.run --compare benchmarks/results/1a2b3c4.json
+
+Each scenario (see benchmarks/scenarios.py) runs in a fresh process with
+its own scratch data directory, so runs never share caches or output, and
+reports per run:
+
+    wall_s                 seconds for the whole entry point
+    rtf                    wall_s per second of audio produced (lower is faster)
+    time_to_first_chunk_s  seconds until the first audio chunk arrived
+    chunks_per_s           audio chunks produced per second
+    peak_rss_bytes         peak resident memory of the process
+    disk_bytes_written     bytes the process wrote to disk, temporary files
+                           included (ffmpeg subprocesses are not counted;
+                           without /proc, only the bytes left behind)
+    output_bytes           bytes left in the data directory afterwards
+
+With --repeat the median of each value is kept. Results are written as
+JSON to benchmarks/results/<commit>.json for comparison across commits.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT_DIR, "benchmarks", "results")
+
+SCENARIO_NAMES = ["quick_tts", "clone", "audiobook", "postprocess"]
+
+# Metrics shown in the summary table and by --compare: (key, column header, scale)
+_COLUMNS = [
+    ("wall_s", "wall s", 1),
+    ("rtf", "RTF", 1),
+    ("time_to_first_chunk_s", "first chunk s", 1),
+    ("chunks_per_s", "chunks/s", 1),
+    ("peak_rss_bytes", "peak RSS MB", 1 / (1024 * 1024)),
+    ("disk_bytes_written", "written MB", 1 / (1024 * 1024)),
+]
+
+
+def run_scenario(name: str, options: dict, keep: bool = False) -> dict:
+    """Run one scenario in a fresh spawned process with a scratch data directory."""
+    data_dir = tempfile.mkdtemp(prefix=f"tts-bench-{name}-")
+    try:
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            return pool.submit(_measure, name, options, data_dir).result()
+    finally:
+        if keep:
+            print(f"Kept {name} data in {data_dir}", file=sys.stderr)
+        else:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def run_all(names: list[str], options: dict, repeat: int = 1, keep: bool = False) -> dict:
+    """Run each scenario `repeat` times and return the median of every metric per scenario."""
+    results = {}
+    for name in names:
+        runs = []
+        for i in range(repeat):
+            print(f"{name}: run {i + 1}/{repeat}", file=sys.stderr)
+            runs.append(run_scenario(name, options, keep))
+        results[name] = {**_median(runs), "runs": repeat}
+    return results
+
+
+def git_commit() -> tuple[str, bool]:
+    """Return (short commit hash, whether the work tree has uncommitted changes)."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+        status = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            cwd=ROOT_DIR, capture_output=True, text=True, check=True,
+        ).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown", False
+    return commit, bool(status.strip())
+
+
+def format_table(results: dict, baseline: dict | None = None) -> str:
+    """Format results as a table; with a baseline, each value is followed by its change."""
+    header = ["scenario"] + [title for _, title, _ in _COLUMNS]
+    rows = [header]
+    for name, metrics in results.items():
+        row = [name]
+        for key, _, scale in _COLUMNS:
+            value = metrics.get(key)
+            cell = "-" if value is None else f"{value * scale:.3f}"
+            old = (baseline or {}).get(name, {}).get(key)
+            if value is not None and old:
+                cell += f" ({(value - old) / old:+.0%})"
+            row.append(cell)
+        rows.append(row)
+    widths = [max(len(row[i]) for row in rows) for i in range(len(header))]
+    return "\n".join("  ".join(cell.ljust(w) for cell, w in zip(row, widths)).rstrip() for row in rows)
+
+
+# ── Child process ─────────────────────────────────────────────────────────
+
+
+def _measure(name: str, options: dict, data_dir: str) -> dict:
+    """Process-pool entry point: run one scenario against data_dir and add resource usage."""
+    # Must be set before config is first imported in this process
+    os.environ["TTS_STUDIO_DATA_DIR"] = data_dir
+    from benchmarks.scenarios import SCENARIOS
+
+    written = _bytes_written()
+    metrics = SCENARIOS[name](options)
+    output_bytes = _tree_bytes(data_dir)
+    written = _bytes_written() - written if written is not None else output_bytes
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        **metrics,
+        # ru_maxrss is in bytes on macOS and KiB on Linux
+        "peak_rss_bytes": rss if sys.platform == "darwin" else rss * 1024,
+        "disk_bytes_written": written,
+        "output_bytes": output_bytes,
+    }
+
+
+def _bytes_written() -> int | None:
+    """Bytes this process has written to storage, from /proc (None where unavailable)."""
+    try:
+        with open("/proc/self/io") as f:
+            fields = dict(line.split(": ") for line in f.read().splitlines() if line)
+    except OSError:
+        return None
+    return int(fields["write_bytes"])
+
+
+def _tree_bytes(path: str) -> int:
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(path)
+        for name in names
+    )
+
+
+def _median(runs: list[dict]) -> dict:
+    merged = {}
+    for key in runs[0]:
+        values = [run[key] for run in runs if run.get(key) is not None]
+        merged[key] = statistics.median(values) if values else None
+    return merged
+
+
+# ── Command line ──────────────────────────────────────────────────────────
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.run", description="Benchmark synthesis entry points with a fake model.",
+    )
+    parser.add_argument(
+        "--scenarios", nargs="+", choices=SCENARIO_NAMES, default=SCENARIO_NAMES, help="default: all",
+    )
+    parser.add_argument("--repeat", type=int, default=1, help="runs per scenario; the median is kept")
+    parser.add_argument(
+        "--rtf", type=float, default=0.02,
+        help="fake model real-time factor, 0 for no simulated inference time (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--batched", action="store_true",
+        help="give the fake model batch_generate(), which mlx-audio models lack (off by default)",
+    )
+    parser.add_argument("--chars", type=int, default=2000, help="text length for Quick TTS and cloning")
+    parser.add_argument("--book-chars", type=int, default=12000, help="audiobook length in characters")
+    parser.add_argument("--chapters", type=int, default=6, help="audiobook and post-processing chapters")
+    parser.add_argument("--segments", type=int, default=40, help="post-processing segments to merge")
+    parser.add_argument("--segment-s", type=float, default=10.0, help="seconds of audio per segment")
+    parser.add_argument("--out", help="results file (default: benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", help="earlier results file to show changes against")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch data directories")
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.repeat < 1:
+        args.repeat = 1
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+
+    options = {
+        "rtf": args.rtf,
+        "batched": args.batched,
+        "chars": args.chars,
+        "reference_s": 8.0,
+        "book_chars": args.book_chars,
+        "chapters": max(1, args.chapters),
+        "segments": args.segments,
+        "segment_s": args.segment_s,
+    }
+    results = run_all(list(dict.fromkeys(args.scenarios)), options, args.repeat, args.keep)
+
+    commit, dirty = git_commit()
+    report = {
+        "commit": commit,
+        "dirty": dirty,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "options": options,
+        "results": results,
+    }
+    out = args.out or os.path.join(RESULTS_DIR, f"{commit}{'-dirty' if dirty else ''}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(format_table(results, baseline))
+    print(f"\nResults written to {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
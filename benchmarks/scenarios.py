@@ -0,0 +1,193 @@
+"""Benchmark scenarios: each drives one real entry point against FakeModel.
+
+A scenario takes the options dict from benchmarks.run and returns its
+timings: wall_s, audio_s, rtf, time_to_first_chunk_s, chunks and
+chunks_per_s. Run them through benchmarks.run, which gives every scenario
+its own process and scratch data directory.
+"""
+import os
+import random
+import shutil
+import time
+from typing import Callable
+
+import numpy as np
+
+from benchmarks.fake_model import BatchingFakeModel, FakeModel
+from config import OUTPUT_DIR, UPLOADS_DIR, get_sample_rate
+from services.audio_encoder import encoder_available, maybe_encode
+from services.audio_utils import create_zip, merge_audio_files, save_audio
+from services.model_manager import manager
+from services.scheduler import scheduler, PRIORITY_INTERACTIVE
+from services.tts_engine import stream_clone, stream_speech, write_audio
+
+SPEECH_MODEL = "Kokoro-82M"
+SPEECH_VOICE = "af_heart"
+CLONE_MODEL = "Qwen3-TTS-Base"
+
+_WORDS = (
+    "the a of and to in was he she it that his her with as for had on at by not be "
+    "house river morning letter window garden silence captain doctor evening station "
+    "road summer voice door light fire paper answer question moment heart mother "
+    "walked looked turned waited laughed remembered whispered opened carried followed "
+    "quiet old small bright cold strange careful distant heavy sudden"
+).split()
+
+
+class Meter:
+    """Count audio chunks and time the first one, from construction on."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.first: float | None = None
+        self.chunks = 0
+        self.frames = 0
+
+    def observe(self, audio) -> None:
+        if self.first is None:
+            self.first = time.perf_counter()
+        self.chunks += 1
+        self.frames += len(audio)
+
+    def result(self, sample_rate: int) -> dict:
+        wall = time.perf_counter() - self.start
+        audio_s = self.frames / sample_rate
+        return {
+            "wall_s": wall,
+            "audio_s": audio_s,
+            "rtf": wall / audio_s if audio_s else None,
+            "time_to_first_chunk_s": self.first - self.start if self.first is not None else None,
+            "chunks": self.chunks,
+            "chunks_per_s": self.chunks / wall if wall else None,
+        }
+
+
+def sample_text(chars: int, seed: int = 0) -> str:
+    """Return about `chars` characters of deterministic prose in paragraphs."""
+    rng = random.Random(seed)
+    paragraphs, length = [], 0
+    while length < chars:
+        sentences = []
+        for _ in range(rng.randint(3, 6)):
+            words = rng.choices(_WORDS, k=rng.randint(6, 18))
+            sentences.append(" ".join(words).capitalize() + rng.choice([".", ".", ".", "?", "!"]))
+        paragraph = " ".join(sentences)
+        paragraphs.append(paragraph)
+        length += len(paragraph) + 2
+    return "\n\n".join(paragraphs)
+
+
+def use_fake_models(rtf: float, on_chunk: Callable | None = None, batched: bool = False) -> None:
+    """Make the model manager load FakeModel instead of mlx-audio models.
+
+    With batched=True the fake models also have batch_generate(), which no
+    mlx-audio model has yet, so default runs take the production code path.
+    """
+    model_class = BatchingFakeModel if batched else FakeModel
+    manager.set_loader(lambda name: model_class(get_sample_rate(name), rtf=rtf, on_chunk=on_chunk))
+
+
+# ── Scenarios ─────────────────────────────────────────────────────────────
+
+
+def quick_tts(options: dict) -> dict:
+    """Quick TTS: stream one text through the scheduler and write the WAV, as the tab does."""
+    use_fake_models(options["rtf"], batched=options["batched"])
+    text = sample_text(options["chars"])
+    meter = Meter()
+    chunks = []
+    for chunk in scheduler.stream(
+        SPEECH_MODEL, PRIORITY_INTERACTIVE, stream_speech, text, SPEECH_MODEL, SPEECH_VOICE, 1.0,
+    ):
+        meter.observe(chunk)
+        chunks.append(chunk)
+    write_audio(chunks, SPEECH_MODEL, "tts")
+    return meter.result(get_sample_rate(SPEECH_MODEL))
+
+
+def clone(options: dict) -> dict:
+    """Voice cloning: normalize a reference clip, stream the text and write the WAV."""
+    use_fake_models(options["rtf"], batched=options["batched"])
+    text = sample_text(options["chars"], seed=1)
+    ref_path = os.path.join(UPLOADS_DIR, "reference.wav")
+    save_audio(_tone(options["reference_s"], 44100), ref_path, sample_rate=44100)
+    meter = Meter()
+    chunks = []
+    for chunk in scheduler.stream(
+        CLONE_MODEL, PRIORITY_INTERACTIVE, stream_clone, text, CLONE_MODEL, ref_path, "Reference text.",
+    ):
+        meter.observe(chunk)
+        chunks.append(chunk)
+    write_audio(chunks, CLONE_MODEL, "clone")
+    return meter.result(get_sample_rate(CLONE_MODEL))
+
+
+def audiobook(options: dict) -> dict:
+    """Audiobook: render a text book to WAV chapters and a ZIP through the CLI's render_book().
+
+    Chunks are counted as the model produces them, since the pipeline
+    consumes them internally.
+    """
+    from cli import render_book, voice_spec
+
+    meter = Meter()
+    use_fake_models(options["rtf"], on_chunk=meter.observe, batched=options["batched"])
+    book_path = os.path.join(UPLOADS_DIR, "book.txt")
+    with open(book_path, "w", encoding="utf-8") as f:
+        f.write("\n\n".join(
+            f"Chapter {i + 1}\n\n{sample_text(options['book_chars'] // options['chapters'], seed=100 + i)}"
+            for i in range(options["chapters"])
+        ))
+    meter.start = time.perf_counter()
+    render_book(book_path, voice_spec(SPEECH_MODEL, SPEECH_VOICE))
+    return meter.result(get_sample_rate(SPEECH_MODEL))
+
+
+def postprocess(options: dict) -> dict:
+    """Merge, encode and zip: join rendered segments into chapter WAVs, encode them to MP3 and ZIP the lot.
+
+    Each segment counts as a chunk; there is no first-chunk latency here.
+    Encoding is skipped (encode_s is None) when no MP3 encoder is installed.
+    """
+    sample_rate = get_sample_rate(SPEECH_MODEL)
+    segments = [_tone(options["segment_s"], sample_rate, seed=i) for i in range(options["segments"])]
+    per_chapter = max(1, len(segments) // options["chapters"])
+    work_dir = os.path.join(OUTPUT_DIR, "postprocess")
+    os.makedirs(work_dir)
+
+    meter = Meter()
+    paths = []
+    for start in range(0, len(segments), per_chapter):
+        path = os.path.join(work_dir, f"chapter_{len(paths):03d}.wav")
+        paths.append(merge_audio_files(segments[start:start + per_chapter], path, sample_rate))
+        for seg in segments[start:start + per_chapter]:
+            meter.observe(seg)
+    merge_s = time.perf_counter() - meter.start
+
+    encode_s = None
+    if encoder_available("MP3"):
+        encode_start = time.perf_counter()
+        # maybe_encode() replaces its input, so encode copies to keep the WAVs for the ZIP
+        for path in paths:
+            copy = shutil.copyfile(path, os.path.splitext(path)[0] + "_enc.wav")
+            maybe_encode(copy, "MP3")
+        encode_s = time.perf_counter() - encode_start
+
+    zip_start = time.perf_counter()
+    create_zip(paths, os.path.join(work_dir, "chapters.zip"))
+    zip_s = time.perf_counter() - zip_start
+
+    return {**meter.result(sample_rate), "time_to_first_chunk_s": None, "merge_s": merge_s, "encode_s": encode_s, "zip_s": zip_s}
+
+
+def _tone(seconds: float, sample_rate: int, seed: int = 0) -> np.ndarray:
+    frames = np.arange(int(seconds * sample_rate))
+    return (0.1 * np.sin(frames * 2 * np.pi * (220.0 + 10 * seed) / sample_rate)).astype(np.float32)
+
+
+SCENARIOS: dict[str, Callable[[dict], dict]] = {
+    "quick_tts": quick_tts,
+    "clone": clone,
+    "audiobook": audiobook,
+    "postprocess": postprocess,
+}
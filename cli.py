@@ -0,0 +1,507 @@
+"""Headless batch renderer: synthesize books, text lists and JSONL job files without the UI.
+
+    python cli.py book novel.epub --model Kokoro-82M --voice af_heart --format MP3 --package M4B
+    python cli.py texts lines.txt --voice am_michael --out renders/
+    python cli.py jobs jobs.jsonl --parallel 4 > report.jsonl
+
+Exit status is 0 when everything rendered, 1 when any item failed, 2 for
+usage errors and 130 when interrupted.
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from config import (
+    ALL_MODEL_NAMES, AUDIOBOOK_FORMATS, AUDIOBOOK_PACKAGING, AUDIOBOOK_POSTPROCESS_WORKERS, DIALOGUE_MODEL_NAMES,
+    OUTPUT_DIR, SAVED_VOICE_PREFIX, SCHEDULER_MAX_CONCURRENT, VOICE_DESIGN_MODEL_NAMES,
+    get_sample_rate,
+)
+from services.audio_encoder import maybe_encode, output_extension
+from services.audio_utils import save_audio
+from services.audiobook_jobs import AudiobookJob
+from services.audiobook_pipeline import AudiobookPipeline
+from services.corpus_store import book_chapters, load_book
+from services.epub_parser import chapter_text, index_file
+from services.hashing import file_sha256
+from services.model_manager import manager
+from services.scheduler import scheduler, PRIORITY_BATCH
+from services.text_chunker import chunk_chars, chunk_text
+from services.tts_engine import (
+    clone_voice_batch, collect_audio, generate_speech_batch, stream_dialogue, stream_voice_design,
+    synthesis_batch_size,
+)
+from services.voice_library import find_voice
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+EXIT_INTERRUPTED = 130
+
+JOB_TYPES = ["speech", "clone", "design", "dialogue", "book"]
+
+logger = logging.getLogger("tts-cli")
+
+# Set on Ctrl-C so running renders stop at their next chunk
+_interrupted = threading.Event()
+_pipelines: set[AudiobookPipeline] = set()
+_pipelines_lock = threading.Lock()
+
+
+class UsageError(Exception):
+    """Bad input that no retry will fix; exits with EXIT_USAGE."""
+
+
+# ── Voices and synthesis ──────────────────────────────────────────────────
+
+
+def voice_spec(
+    model: str,
+    voice: str | None = None,
+    speed: float = 1.0,
+    instruct: str = "",
+    saved_voice: str | None = None,
+    base_voice: str | None = None,
+    ref_audio: str | None = None,
+    ref_text: str = "",
+    incremental: bool = False,
+) -> dict:
+    """Resolve voice options into what synthesize() needs, as the Audiobook tab does.
+
+    A saved voice (from the voice library) or a reference clip selects
+    cloning; otherwise `voice` is a preset voice of `model`.
+    """
+    if model not in ALL_MODEL_NAMES:
+        raise UsageError(f"Unknown model '{model}'.")
+    spec = {
+        "model": model, "voice": voice, "speed": speed, "instruct": (instruct or "").strip(),
+        "ref_audio": None, "ref_text": "", "incremental": incremental, "label": voice,
+    }
+    if saved_voice:
+        try:
+            data = find_voice(saved_voice)
+        except FileNotFoundError:
+            raise UsageError(f"Saved voice '{saved_voice}' not found.") from None
+        spec.update(
+            model=data.get("model", model), voice=base_voice or data.get("base_voice", "Chelsie"),
+            speed=1.0, ref_audio=data["ref_audio_path"], ref_text=data.get("ref_text", ""),
+            label=SAVED_VOICE_PREFIX + saved_voice,
+        )
+    elif ref_audio:
+        if not os.path.isfile(ref_audio):
+            raise UsageError(f"Reference audio '{ref_audio}' not found.")
+        spec.update(voice=base_voice or "Chelsie", speed=1.0, ref_audio=ref_audio, ref_text=ref_text or "")
+    elif not voice:
+        raise UsageError("A voice, saved voice or reference audio is required.")
+    return spec
+
+
+def synthesize(texts: list[str], spec: dict) -> list:
+    """Render texts with one voice as a single batch-priority scheduler job. Returns one array per text.
+
+    Pass at most batch_size(spec) texts, so the job stays short.
+    """
+    if _interrupted.is_set():
+        raise RuntimeError("Interrupted.")
+    if spec["ref_audio"]:
+        return scheduler.run(
+            spec["model"], PRIORITY_BATCH, clone_voice_batch,
+            texts, spec["model"], spec["ref_audio"], spec["ref_text"],
+            voice=spec["voice"], instruct=spec["instruct"], incremental=spec["incremental"], as_arrays=True,
+        )
+    return scheduler.run(
+        spec["model"], PRIORITY_BATCH, generate_speech_batch,
+        texts, spec["model"], spec["voice"], spec["speed"],
+        instruct=spec["instruct"], incremental=spec["incremental"], as_arrays=True,
+    )
+
+
+def batch_size(spec: dict) -> int:
+    """Return how many texts one synthesize() call should take for this voice."""
+    return scheduler.run(spec["model"], PRIORITY_BATCH, synthesis_batch_size, spec["model"])
+
+
+def write_output(audio, model: str, path: str, output_format: str) -> str:
+    """Save audio as WAV at `path` (extension replaced), encoding it if needed. Returns the final path."""
+    wav_path = os.path.splitext(path)[0] + ".wav"
+    os.makedirs(os.path.dirname(os.path.abspath(wav_path)), exist_ok=True)
+    save_audio(audio, wav_path, sample_rate=get_sample_rate(model))
+    return maybe_encode(wav_path, output_format)
+
+
+# ── Books ─────────────────────────────────────────────────────────────────
+
+
+def render_book(
+    source: str,
+    spec: dict,
+    output_format: str = "WAV",
+    packaging: str = "ZIP",
+    chapters: set[int] | None = None,
+    out_dir: str | None = None,
+    workers: int = AUDIOBOOK_POSTPROCESS_WORKERS,
+) -> tuple[str, int]:
+    """Render an EPUB/TXT file or a corpus book (by hash) through the audiobook pipeline.
+
+    Uses the same job manifests as the Audiobook tab, so an interrupted
+    render resumes from either. Returns (package path, failed chapter count).
+    """
+    manifest = None if os.path.isfile(source) else load_book(source)
+    if manifest is not None:
+        book_hash = source
+        name = manifest["name"]
+        selected = [ch for ch in book_chapters(source) if chapters is None or ch["order"] in chapters]
+    elif os.path.isfile(source):
+        book_hash = file_sha256(source)
+        name = os.path.basename(source)
+        index = [ch for ch in index_file(source, book_hash) if chapters is None or ch["order"] in chapters]
+        selected = [{**ch, "content": chapter_text(source, book_hash, ch["order"])} for ch in index]
+    else:
+        raise UsageError(f"'{source}' is neither a file nor a book in the corpus.")
+    if not selected:
+        raise UsageError(f"No chapters to render in '{name}'.")
+
+    model = spec["model"]
+    settings = {
+        "model": model,
+        "voice": spec["label"],
+        "base_voice": spec["voice"] if spec["ref_audio"] else None,
+        "instruct": spec["instruct"],
+        "speed": spec["speed"],
+        "output_format": output_format,
+        "incremental": spec["incremental"],
+    }
+    job = AudiobookJob.open(book_hash, name, settings)
+    done, total = job.prepare(selected, lambda text: chunk_text(text, chunk_chars(model)))
+    logger.info("%s: job %s, %d/%d chunks already rendered", name, job.job_id, done, total)
+
+    pipeline = AudiobookPipeline(
+        job, lambda chunks: synthesize(chunks, spec),
+        output_format=output_format, packaging=packaging,
+        sample_rate=get_sample_rate(model), postprocess_workers=workers,
+        # Sizing batches loads the model, so skip it when nothing is left to synthesize
+        batch_size=batch_size(spec) if done < total else 1,
+    )
+    with _pipelines_lock:
+        _pipelines.add(pipeline)
+    if _interrupted.is_set():
+        pipeline.stop()
+    try:
+        for line in pipeline.run(selected):
+            logger.info("%s: %s", name, line.strip())
+    finally:
+        with _pipelines_lock:
+            _pipelines.discard(pipeline)
+    if _interrupted.is_set():
+        raise RuntimeError("Interrupted.")
+    if not pipeline.package_path:
+        raise RuntimeError("no chapters were rendered" if not pipeline.chapter_paths else "packaging failed")
+
+    failed = sum(1 for ch in selected if job.chunks(ch["order"]) and not job.chapter_output(ch["order"]))
+    path = pipeline.package_path
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+        path = shutil.copy2(path, os.path.join(out_dir, os.path.splitext(name)[0] + os.path.splitext(path)[1]))
+    return path, failed
+
+
+# ── Commands ──────────────────────────────────────────────────────────────
+
+
+def cmd_book(args) -> int:
+    spec = _spec_from_args(args)
+    chapters = _parse_chapters(args.chapters)
+    for source in args.books:
+        if not os.path.isfile(source) and load_book(source) is None:
+            raise UsageError(f"'{source}' is neither a file nor a book in the corpus.")
+
+    def render(source):
+        path, failed = render_book(
+            source, spec, args.format, args.package, chapters, args.out, args.workers,
+        )
+        if failed:
+            raise RuntimeError(f"{failed} chapters failed; partial audiobook at {path}")
+        return path
+
+    return _run_all(args.books, render, args.parallel, label=os.path.basename)
+
+
+def cmd_texts(args) -> int:
+    spec = _spec_from_args(args)
+    stream = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    with stream:
+        lines = [(n, line.strip()) for n, line in enumerate(stream, 1) if line.strip()]
+    out_dir = args.out or os.path.join(OUTPUT_DIR, "cli")
+    size = batch_size(spec)
+    batches = [lines[start:start + size] for start in range(0, len(lines), size)]
+
+    def render(batch):
+        try:
+            audios = synthesize([text for _, text in batch], spec)
+            errors = []
+        except Exception:
+            if len(batch) == 1:
+                raise
+            # Retry line by line so one bad line doesn't sink the whole batch
+            audios, errors = [], []
+            for n, text in batch:
+                try:
+                    audios.append(synthesize([text], spec)[0])
+                except Exception as e:
+                    audios.append(None)
+                    errors.append(f"line {n}: {e}")
+        paths = []
+        for (n, _), audio in zip(batch, audios):
+            if audio is not None:
+                path = os.path.join(out_dir, f"{args.prefix}{n:04d}{output_extension(args.format)}")
+                paths.append(write_output(audio, spec["model"], path, args.format))
+        if errors:
+            raise RuntimeError("; ".join(errors))
+        return ", ".join(paths)
+
+    return _run_all(batches, render, args.parallel, label=lambda b: f"lines {b[0][0]}-{b[-1][0]}")
+
+
+def cmd_jobs(args) -> int:
+    stream = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    with stream:
+        jobs = []
+        for n, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            try:
+                job = json.loads(line)
+            except ValueError as e:
+                raise UsageError(f"Line {n}: invalid JSON ({e}).") from None
+            if not isinstance(job, dict):
+                raise UsageError(f"Line {n}: expected a JSON object.")
+            jobs.append((n, job))
+    out_dir = args.out or os.path.join(OUTPUT_DIR, "cli")
+
+    def render(item):
+        n, job = item
+        return _render_job(job, args, os.path.join(out_dir, str(job.get("id", f"job{n:04d}"))))
+
+    def report(item, path, error, seconds):
+        n, job = item
+        record = {"line": n, "id": job.get("id"), "status": "failed" if error else "ok",
+                  "output": path, "error": error, "seconds": round(seconds, 2)}
+        print(json.dumps(record), flush=True)
+
+    return _run_all(jobs, render, args.parallel, label=lambda item: f"line {item[0]}", on_result=report)
+
+
+def _render_job(job: dict, args, default_output: str) -> str:
+    """Render one JSONL job line; fields missing from the line fall back to the command-line options."""
+    kind = job.get("type", "speech")
+    if kind not in JOB_TYPES:
+        raise UsageError(f"Unknown job type '{kind}'.")
+    if kind != "book" and not job.get("text", "").strip():
+        raise UsageError("Job needs text.")
+    output_format = job.get("format", args.format)
+    output = job.get("output") or default_output + output_extension(output_format)
+
+    if kind == "design":
+        model = job.get("model", VOICE_DESIGN_MODEL_NAMES[0])
+        audio = scheduler.run(
+            model, PRIORITY_BATCH, lambda: collect_audio(_until_interrupted(stream_voice_design(
+                job["text"], model, job.get("language", "auto"), job.get("instruct", ""),
+            ))),
+        )
+        return write_output(audio, model, output, output_format)
+    if kind == "dialogue":
+        model = job.get("model", DIALOGUE_MODEL_NAMES[0])
+        audio = scheduler.run(
+            model, PRIORITY_BATCH, lambda: collect_audio(_until_interrupted(stream_dialogue(job["text"], model))),
+        )
+        return write_output(audio, model, output, output_format)
+
+    spec = voice_spec(
+        job.get("model", args.model),
+        voice=job.get("voice", args.voice),
+        speed=job.get("speed", args.speed),
+        instruct=job.get("instruct", args.instruct),
+        saved_voice=job.get("saved_voice", None if "ref_audio" in job else args.saved_voice),
+        base_voice=job.get("base_voice", args.base_voice),
+        ref_audio=job.get("ref_audio", None if "saved_voice" in job else args.ref_audio),
+        ref_text=job.get("ref_text", args.ref_text),
+        incremental=job.get("incremental", args.incremental),
+    )
+    if kind == "clone" and not spec["ref_audio"]:
+        raise UsageError("Clone jobs need ref_audio or saved_voice.")
+    if kind == "book":
+        if "path" not in job:
+            raise UsageError("Book jobs need a path (file or corpus book hash).")
+        path, failed = render_book(
+            job["path"], spec, output_format, job.get("package", args.package),
+            _parse_chapters(job.get("chapters")), job.get("out", args.out), args.workers,
+        )
+        if failed:
+            raise RuntimeError(f"{failed} chapters failed; partial audiobook at {path}")
+        return path
+
+    return write_output(synthesize([job["text"]], spec)[0], spec["model"], output, output_format)
+
+
+def _run_all(items: list, render, parallel: int, label, on_result=None) -> int:
+    """Render items with up to `parallel` in flight. Returns EXIT_OK or EXIT_FAILED."""
+    failures = 0
+    started = time.monotonic()
+    pool = ThreadPoolExecutor(max_workers=max(1, parallel))
+    try:
+        futures = {pool.submit(_timed, render, item): item for item in items}
+        for future in as_completed(futures):
+            item = futures[future]
+            path, error, seconds = future.result()
+            if error:
+                failures += 1
+                logger.error("%s: FAILED — %s", label(item), error)
+            else:
+                logger.info("%s: %s (%.1fs)", label(item), path, seconds)
+            if on_result is not None:
+                on_result(item, path, error, seconds)
+    except KeyboardInterrupt:
+        # Drop queued items instead of waiting for them, as leaving a with-block would
+        pool.shutdown(wait=False, cancel_futures=True)
+        _interrupt()
+        raise
+    pool.shutdown()
+    logger.info(
+        "%d/%d succeeded in %.1fs", len(items) - failures, len(items), time.monotonic() - started,
+    )
+    return EXIT_FAILED if failures else EXIT_OK
+
+
+def _interrupt() -> None:
+    """Make running renders stop at their next chunk."""
+    _interrupted.set()
+    with _pipelines_lock:
+        for pipeline in _pipelines:
+            pipeline.stop()
+
+
+def _until_interrupted(chunks):
+    """Pass chunks through, failing at the next one once the run is interrupted."""
+    for chunk in chunks:
+        if _interrupted.is_set():
+            raise RuntimeError("Interrupted.")
+        yield chunk
+
+
+def _timed(render, item) -> tuple[str | None, str | None, float]:
+    """Run render(item), returning (result, error message, seconds) instead of raising."""
+    start = time.monotonic()
+    try:
+        return render(item), None, time.monotonic() - start
+    except Exception as e:
+        logger.debug("render failed", exc_info=True)
+        return None, str(e) or type(e).__name__, time.monotonic() - start
+
+
+def _spec_from_args(args) -> dict:
+    return voice_spec(
+        args.model, voice=args.voice, speed=args.speed, instruct=args.instruct,
+        saved_voice=args.saved_voice, base_voice=args.base_voice,
+        ref_audio=args.ref_audio, ref_text=args.ref_text, incremental=args.incremental,
+    )
+
+
+def _parse_chapters(value) -> set[int] | None:
+    """Parse "0,2,5-7" (or a list of ints) into chapter orders; None selects every chapter."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, list):
+        return {int(v) for v in value}
+    orders = set()
+    try:
+        for part in str(value).split(","):
+            low, _, high = part.strip().partition("-")
+            orders.update(range(int(low), int(high or low) + 1))
+    except ValueError:
+        raise UsageError(f"Invalid chapter list '{value}'.") from None
+    return orders
+
+
+# ── Entry point ───────────────────────────────────────────────────────────
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="cli.py", description="Render speech without the web UI.")
+    parser.add_argument("-v", "--verbose", action="store_true", help="log debug output")
+    parser.add_argument("-q", "--quiet", action="store_true", help="only log errors")
+
+    common = argparse.ArgumentParser(add_help=False)
+    voice = common.add_argument_group("voice")
+    voice.add_argument("--model", default="Kokoro-82M", help="model name (default: %(default)s)")
+    voice.add_argument("--voice", default="af_heart", help="preset voice (default: %(default)s)")
+    voice.add_argument("--speed", type=float, default=1.0)
+    voice.add_argument("--instruct", default="", help="style instruction (CustomVoice models)")
+    voice.add_argument("--saved-voice", help="name of a voice in the voice library")
+    voice.add_argument("--base-voice", help="base speaker for CustomVoice cloning")
+    voice.add_argument("--ref-audio", help="reference clip to clone")
+    voice.add_argument("--ref-text", default="", help="transcript of the reference clip")
+    voice.add_argument("--incremental", action="store_true", help="render and cache sentence by sentence")
+    output = common.add_argument_group("output")
+    output.add_argument("--format", choices=AUDIOBOOK_FORMATS, default="WAV")
+    output.add_argument("--out", help="output directory")
+    run = common.add_argument_group("concurrency")
+    run.add_argument("--parallel", type=int, default=1, help="items in flight at once (default: %(default)s)")
+    run.add_argument(
+        "--max-concurrent", type=int, default=SCHEDULER_MAX_CONCURRENT,
+        help="synthesis jobs running on the accelerator at once (default: %(default)s)",
+    )
+    run.add_argument(
+        "--workers", type=int, default=AUDIOBOOK_POSTPROCESS_WORKERS,
+        help="chapter writer/encoder threads per book (default: %(default)s)",
+    )
+    run.add_argument("--budget-mb", type=int, help="model cache memory budget in MB")
+
+    sub = parser.add_subparsers(dest="command", required=True)
+    book = sub.add_parser("book", parents=[common], help="render EPUB/TXT books or corpus books into audiobooks")
+    book.add_argument("books", nargs="+", help="book files, or book hashes from the corpus store")
+    book.add_argument("--package", choices=AUDIOBOOK_PACKAGING, default="ZIP")
+    book.add_argument("--chapters", help='chapter orders to render, e.g. "0,2,5-7" (default: all)')
+    book.set_defaults(func=cmd_book)
+
+    texts = sub.add_parser("texts", parents=[common], help="render one audio file per line of a text file")
+    texts.add_argument("input", help='text file, or "-" for stdin')
+    texts.add_argument("--prefix", default="line_", help="output file name prefix (default: %(default)s)")
+    texts.set_defaults(func=cmd_texts)
+
+    jobs = sub.add_parser("jobs", parents=[common], help="render a JSONL job file; prints a JSONL report")
+    jobs.add_argument("input", help='JSONL file, or "-" for stdin')
+    jobs.add_argument("--package", choices=AUDIOBOOK_PACKAGING, default="ZIP")
+    jobs.set_defaults(func=cmd_jobs)
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.ERROR if args.quiet else logging.INFO,
+        format="%(asctime)s %(levelname)s %(message)s",
+        stream=sys.stderr,
+    )
+    scheduler.set_max_concurrent(args.max_concurrent)
+    if args.budget_mb:
+        manager.set_budget(args.budget_mb)
+    try:
+        return args.func(args)
+    except UsageError as e:
+        parser.error(str(e))
+    except OSError as e:
+        logger.error("%s", e)
+        return EXIT_USAGE
+    except KeyboardInterrupt:
+        logger.error("Interrupted.")
+        return EXIT_INTERRUPTED
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,64 +1,153 @@
 import os
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-UPLOADS_DIR = os.path.join(BASE_DIR, "uploads")
-OUTPUT_DIR = os.path.join(BASE_DIR, "output")
-VOICES_DIR = os.path.join(BASE_DIR, "voices")
+# Root of uploads, output, voices and caches; benchmarks point it at a scratch directory
+DATA_DIR = os.environ.get("TTS_STUDIO_DATA_DIR", BASE_DIR)
+UPLOADS_DIR = os.path.join(DATA_DIR, "uploads")
+OUTPUT_DIR = os.path.join(DATA_DIR, "output")
+VOICES_DIR = os.path.join(DATA_DIR, "voices")
+JOBS_DIR = os.path.join(OUTPUT_DIR, "jobs")
+CACHE_DIR = os.path.join(DATA_DIR, "cache")
+SYNTHESIS_CACHE_DIR = os.path.join(CACHE_DIR, "synthesis")
+REFERENCE_CACHE_DIR = os.path.join(CACHE_DIR, "references")
+CORPUS_DIR = os.path.join(OUTPUT_DIR, "corpus")
 
 os.makedirs(UPLOADS_DIR, exist_ok=True)
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 os.makedirs(VOICES_DIR, exist_ok=True)
+os.makedirs(JOBS_DIR, exist_ok=True)
+os.makedirs(SYNTHESIS_CACHE_DIR, exist_ok=True)
+os.makedirs(REFERENCE_CACHE_DIR, exist_ok=True)
+os.makedirs(CORPUS_DIR, exist_ok=True)
 
 SAVED_VOICE_PREFIX = "\U0001f3a4 "
 
 DEFAULT_SAMPLE_RATE = 24000
 TEXT_CHAR_LIMIT_WARNING = 10_000
 
+# Audiobook pipeline: threads that merge/encode finished chapters while the
+# next ones are synthesized, and how many synthesized chapters may wait for them.
+AUDIOBOOK_POSTPROCESS_WORKERS = 2
+AUDIOBOOK_QUEUE_SIZE = 2
+
+# Audiobook chapter formats; anything but WAV is encoded on the fly.
+AUDIOBOOK_FORMATS = ["WAV", "MP3", "Opus", "AAC"]
+
+# How finished audiobook chapters are delivered: a ZIP of chapter files, or
+# one file with chapter markers.
+AUDIOBOOK_PACKAGING = ["ZIP", "M4B", "MP3"]
+
+# Worker processes that parse and chunk books in parallel during bulk ingestion.
+INGEST_WORKERS = max(1, min(4, (os.cpu_count() or 2) - 1))
+
+# Streaming encoders (ffmpeg processes) allowed to run at once across the app
+# for audiobook chapters, which hold one for a whole chapter's synthesis.
+ENCODER_POOL_SIZE = 2
+
+# One-shot file conversions (exports from the interactive tabs) allowed at once;
+# a separate pool, so an export never waits for a chapter to finish.
+ONESHOT_ENCODER_POOL_SIZE = 2
+
+# On-disk cache of synthesized audio; least recently used entries are evicted
+# once it grows past this size.
+SYNTHESIS_CACHE_MAX_MB = 2048
+
+# Synthesis jobs the central scheduler runs at once (one accelerator → 1).
+SCHEDULER_MAX_CONCURRENT = 1
+
+# How many times in a row the scheduler may run a job for an already-loaded
+# model ahead of an older same-priority job that would force a model switch.
+SCHEDULER_AFFINITY_MAX_BYPASS = 8
+
+# Silence spliced between sentences when text is rendered sentence by sentence.
+SENTENCE_GAP_MS = 120
+
+# Text chunks sharing a model and voice that are synthesized together in one
+# batched model call and one scheduler job; only for models with batch_generate,
+# others get one chunk per job.
+SYNTHESIS_BATCH_SIZE = 4
+
+# Characters per synthesis chunk for models without a "chunk_chars" entry.
+DEFAULT_CHUNK_CHARS = 2000
+
 # ── Model Definitions ──────────────────────────────────────────────────────────
 
+# chunk_chars: longest text chunk sent to the model in one call. Kokoro
+# splits long input itself; the autoregressive models drift and slow down on
+# long prompts, so they get shorter chunks (CSM the shortest).
 MODELS = {
     "Kokoro-82M": {
         "repo_id": "mlx-community/Kokoro-82M-bf16",
         "supports_cloning": False,
         "description": "Fast TTS, 50+ preset voices (~200MB)",
+        "size_mb": 200,
+        "chunk_chars": 2000,
     },
     "Qwen3-TTS-Base": {
         "repo_id": "mlx-community/Qwen3-TTS-12Hz-0.6B-Base-bf16",
         "supports_cloning": True,
         "description": "Higher quality + voice cloning (~1.2GB)",
+        "size_mb": 1200,
+        "chunk_chars": 600,
     },
     "Qwen3-TTS-CustomVoice": {
         "repo_id": "mlx-community/Qwen3-TTS-12Hz-0.6B-CustomVoice-8bit",
         "supports_cloning": True,
         "description": "Cloning with emotion control (~800MB)",
+        "size_mb": 800,
+        "chunk_chars": 600,
     },
     "Qwen3-TTS-Base-1.7B": {
         "repo_id": "mlx-community/Qwen3-TTS-12Hz-1.7B-Base-bf16",
         "supports_cloning": True,
         "description": "1.7B base model, higher quality (~3.4GB)",
+        "size_mb": 3400,
+        "chunk_chars": 800,
     },
     "Qwen3-TTS-CustomVoice-1.7B": {
         "repo_id": "mlx-community/Qwen3-TTS-12Hz-1.7B-CustomVoice-bf16",
         "supports_cloning": True,
         "description": "1.7B cloning with emotion control (~3.4GB)",
+        "size_mb": 3400,
+        "chunk_chars": 800,
     },
     "Qwen3-TTS-VoiceDesign": {
         "repo_id": "mlx-community/Qwen3-TTS-12Hz-1.7B-VoiceDesign-bf16",
         "supports_cloning": False,
         "description": "Design voices from text descriptions (~3.4GB)",
+        "size_mb": 3400,
+        "chunk_chars": 800,
     },
     "CSM-1B": {
         "repo_id": "mlx-community/csm-1b",
         "supports_cloning": True,
         "description": "Sesame conversational voice cloning (~2GB)",
+        "size_mb": 2000,
+        "chunk_chars": 400,
     },
     "Dia-1.6B": {
         "repo_id": "mlx-community/Dia-1.6B-bf16",
         "supports_cloning": False,
         "description": "Multi-speaker dialogue generation (~3.2GB)",
+        "size_mb": 3200,
+        "chunk_chars": 800,
     },
 }
 
+# Upper bound on resident model memory. ModelManager evicts least recently used
+# (unpinned) models until a newly requested model fits.
+MODEL_CACHE_BUDGET_MB = 8192
+
+# Models that are never evicted once loaded.
+PINNED_MODELS: list[str] = []
+
+# Models loaded (and run through a tiny warmup synthesis) in the background at
+# startup, so the first request on each tab doesn't pay the load latency.
+PREWARM_MODELS = ["Kokoro-82M", "Qwen3-TTS-Base"]
+
+# Start loading a model as soon as it is picked in a tab's model dropdown.
+PREDICTIVE_PRELOAD = True
+
 ALL_MODEL_NAMES = list(MODELS.keys())
 CLONING_MODEL_NAMES = [k for k, v in MODELS.items() if v["supports_cloning"]]
 
@@ -141,6 +230,33 @@ MODEL_VOICES = {
     "Dia-1.6B": [],
 }
 
+# ── OpenAI-compatible API ─────────────────────────────────────────────────────
+
+# OpenAI speech model names -> local models (local model names work as-is too)
+OPENAI_MODELS = {
+    "tts-1": "Kokoro-82M",
+    "tts-1-hd": "Qwen3-TTS-Base-1.7B",
+    "gpt-4o-mini-tts": "Qwen3-TTS-CustomVoice",
+}
+
+# OpenAI voice names -> candidate local voices; the first one the model has is used
+OPENAI_VOICES = {
+    "alloy": ["af_alloy", "Chelsie", "conversational_a"],
+    "ash": ["am_adam", "Ryan", "conversational_b"],
+    "ballad": ["bm_george", "Aiden", "conversational_b"],
+    "coral": ["af_heart", "Chelsie", "conversational_a"],
+    "echo": ["am_echo", "Ryan", "conversational_b"],
+    "fable": ["bm_fable", "Aiden", "conversational_b"],
+    "nova": ["af_nova", "Chelsie", "conversational_a"],
+    "onyx": ["am_onyx", "Ryan", "conversational_b"],
+    "sage": ["af_sarah", "Chelsie", "conversational_a"],
+    "shimmer": ["af_bella", "Chelsie", "conversational_a"],
+    "verse": ["am_michael", "Aiden", "conversational_b"],
+}
+
+# Seconds an idle HTTP keep-alive connection stays open for reuse.
+API_KEEP_ALIVE_S = 30
+
 # ── Kokoro language code lookup ────────────────────────────────────────────────
 
 def kokoro_lang_code(voice: str) -> str:
@@ -0,0 +1,417 @@
+import importlib.util
+import os
+import subprocess
+import tempfile
+import threading
+from typing import Iterable, Iterator
+
+import numpy as np
+import soundfile as sf
+
+from config import DEFAULT_SAMPLE_RATE, ENCODER_POOL_SIZE, ONESHOT_ENCODER_POOL_SIZE
+from services.audio_utils import check_ffmpeg
+
+# Output format -> (file extension, ffmpeg muxer, ffmpeg codec arguments)
+ENCODINGS = {
+    "MP3": (".mp3", "mp3", ["-codec:a", "libmp3lame", "-b:a", "192k"]),
+    "Opus": (".opus", "opus", ["-codec:a", "libopus", "-b:a", "64k"]),
+    "AAC": (".m4a", "ipod", ["-codec:a", "aac", "-b:a", "128k"]),
+    "FLAC": (".flac", "flac", ["-codec:a", "flac"]),
+}
+
+# Muxers for encode_stream() where the file muxer needs a seekable output
+_PIPE_MUXERS = {"AAC": "adts"}
+_PIPE_READ_BYTES = 16384
+
+# Single-file packages -> (file extension, ffmpeg muxer, codec of ENCODINGS it holds)
+PACKAGES = {
+    "M4B": (".m4b", "ipod", "AAC"),
+    "MP3": (".mp3", "mp3", "MP3"),
+}
+
+_MP3_KBPS = 192
+
+
+def output_extension(output_format: str) -> str:
+    """Return the file extension for an output format ("WAV" or a key of ENCODINGS)."""
+    if output_format == "WAV":
+        return ".wav"
+    return ENCODINGS[output_format][0]
+
+
+class StreamingEncoder:
+    """Encode audio to MP3, Opus or AAC as it is appended, with no intermediate WAV.
+
+    Float PCM is piped into one ffmpeg process for the whole output (or,
+    for MP3, fed to lameenc in-process when it is installed). Output goes to
+    a temporary file that replaces `output_path` on close, so an interrupted
+    encode never leaves a truncated file behind. Like ChapterWriter, append()
+    puts a silence gap before every chunk but the first.
+    """
+
+    def __init__(
+        self,
+        output_path: str,
+        output_format: str,
+        sample_rate: int = DEFAULT_SAMPLE_RATE,
+        silence_ms: int = 250,
+        on_close=None,
+    ):
+        if output_format not in ENCODINGS:
+            raise ValueError(f"Unsupported output format '{output_format}'.")
+        _, muxer, codec_args = ENCODINGS[output_format]
+
+        self._path = output_path
+        self._tmp_path = output_path + ".part"
+        self._silence = np.zeros(int(sample_rate * silence_ms / 1000), dtype=np.float32)
+        self._frames = 0
+        self._on_close = on_close
+        self._closed = False
+        self._lame = None
+        self._proc = None
+        self._err = None
+
+        if output_format == "MP3":
+            self._lame = _lame_encoder(sample_rate)
+        if self._lame is not None:
+            self._out = open(self._tmp_path, "wb")
+            return
+
+        if not check_ffmpeg():
+            raise RuntimeError(
+                "ffmpeg is not installed. Install with `brew install ffmpeg`."
+            )
+        # stderr goes to a file, not a pipe: nothing reads it until close(), and
+        # a full pipe would block ffmpeg and with it the writer feeding stdin
+        self._err = tempfile.TemporaryFile()
+        self._proc = subprocess.Popen(
+            [
+                "ffmpeg", "-hide_banner", "-loglevel", "error",
+                "-f", "f32le", "-ar", str(sample_rate), "-ac", "1", "-i", "pipe:0",
+                *codec_args, "-f", muxer, "-y", self._tmp_path,
+            ],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
+            stderr=self._err,
+        )
+
+    @property
+    def frames(self) -> int:
+        return self._frames
+
+    def append(self, audio) -> int:
+        """Encode a silence gap (unless nothing was written yet) and then `audio`.
+
+        Returns the number of frames encoded so far.
+        """
+        if self._frames:
+            self.write(self._silence)
+        self.write(audio)
+        return self._frames
+
+    def write(self, audio) -> None:
+        """Encode `audio` with no gap."""
+        data = np.asarray(audio, dtype=np.float32)
+        if data.ndim > 1:
+            data = data[:, 0]
+        if self._lame is not None:
+            pcm = (np.clip(data, -1.0, 1.0) * 32767).astype(np.int16)
+            self._out.write(self._lame.encode(pcm.tobytes()))
+        else:
+            try:
+                self._proc.stdin.write(data.tobytes())
+            except BrokenPipeError:
+                self._proc.wait()
+                error = self._stderr()
+                self.abort()
+                raise RuntimeError(f"Encoding failed: {error}") from None
+        self._frames += len(data)
+
+    def close(self) -> str:
+        """Finish encoding and move the output into place. Returns its path."""
+        if self._closed:
+            return self._path
+        try:
+            if self._lame is not None:
+                self._out.write(self._lame.flush())
+                self._out.close()
+            else:
+                self._proc.stdin.close()
+                if self._proc.wait() != 0:
+                    raise RuntimeError(f"Encoding failed: {self._stderr()}")
+            os.replace(self._tmp_path, self._path)
+        except BaseException:
+            self.abort()
+            raise
+        self._release()
+        return self._path
+
+    def abort(self) -> None:
+        """Stop encoding and delete the partial output."""
+        if self._closed:
+            return
+        if self._lame is not None:
+            self._out.close()
+        else:
+            self._proc.kill()
+            self._proc.wait()
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+        self._release()
+
+    def __enter__(self) -> "StreamingEncoder":
+        return self
+
+    def __exit__(self, exc_type, *exc) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def _release(self) -> None:
+        self._closed = True
+        if self._err is not None:
+            self._err.close()
+        if self._on_close is not None:
+            self._on_close()
+
+    def _stderr(self) -> str:
+        try:
+            self._err.seek(0)
+            return self._err.read().decode(errors="replace").strip()
+        except Exception:
+            return "unknown error"
+
+
+class EncoderPool:
+    """Cap how many StreamingEncoders (and ffmpeg processes) run at once.
+
+    open() blocks until a slot is free; the slot is released when the
+    encoder is closed or aborted.
+    """
+
+    def __init__(self, size: int = ENCODER_POOL_SIZE):
+        self._slots = threading.BoundedSemaphore(max(1, size))
+
+    def open(
+        self,
+        output_path: str,
+        output_format: str,
+        sample_rate: int = DEFAULT_SAMPLE_RATE,
+        silence_ms: int = 250,
+    ) -> StreamingEncoder:
+        self._slots.acquire()
+        try:
+            return StreamingEncoder(
+                output_path, output_format, sample_rate, silence_ms, on_close=self._slots.release,
+            )
+        except BaseException:
+            self._slots.release()
+            raise
+
+
+def encoder_available(output_format: str) -> bool:
+    """Return whether output_format can be encoded here (lameenc for MP3, else ffmpeg)."""
+    if output_format == "MP3" and importlib.util.find_spec("lameenc") is not None:
+        return True
+    return check_ffmpeg()
+
+
+def encode_stream(chunks: Iterable, output_format: str, sample_rate: int = DEFAULT_SAMPLE_RATE) -> Iterator[bytes]:
+    """Encode audio chunks as they arrive, yielding encoded bytes as soon as the encoder emits them.
+
+    Nothing touches the disk: MP3 goes through lameenc when it is installed,
+    everything else through an ffmpeg process writing to a pipe (AAC as
+    ADTS, since MP4 cannot be streamed). Chunks are joined with no gap.
+    Closing the generator stops the encoder and closes `chunks`.
+    """
+    if output_format not in ENCODINGS:
+        raise ValueError(f"Unsupported output format '{output_format}'.")
+    lame = _lame_encoder(sample_rate) if output_format == "MP3" else None
+    if lame is not None:
+        try:
+            for chunk in chunks:
+                data = np.asarray(chunk, dtype=np.float32).reshape(-1)
+                encoded = lame.encode((np.clip(data, -1.0, 1.0) * 32767).astype(np.int16).tobytes())
+                if encoded:
+                    yield bytes(encoded)
+            yield bytes(lame.flush())
+        finally:
+            _close(chunks)
+        return
+
+    if not check_ffmpeg():
+        _close(chunks)
+        raise RuntimeError(
+            "ffmpeg is not installed. Install with `brew install ffmpeg`."
+        )
+    _, muxer, codec_args = ENCODINGS[output_format]
+    proc = subprocess.Popen(
+        [
+            "ffmpeg", "-hide_banner", "-loglevel", "error",
+            "-f", "f32le", "-ar", str(sample_rate), "-ac", "1", "-i", "pipe:0",
+            *codec_args, "-f", _PIPE_MUXERS.get(output_format, muxer), "pipe:1",
+        ],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+    )
+    stopped = threading.Event()
+    failure: list[BaseException] = []
+
+    # Feeds PCM on its own thread so encoded output can be read as it appears
+    def feed():
+        try:
+            for chunk in chunks:
+                if stopped.is_set():
+                    break
+                proc.stdin.write(np.asarray(chunk, dtype=np.float32).reshape(-1).tobytes())
+        except BrokenPipeError:
+            pass
+        except BaseException as e:
+            failure.append(e)
+        finally:
+            _close(chunks)
+            try:
+                proc.stdin.close()
+            except OSError:
+                pass
+
+    feeder = threading.Thread(target=feed, name="encode-stream", daemon=True)
+    feeder.start()
+    try:
+        while True:
+            data = proc.stdout.read1(_PIPE_READ_BYTES)
+            if not data:
+                break
+            yield data
+        feeder.join()
+        if failure:
+            raise failure[0]
+        if proc.wait() != 0:
+            raise RuntimeError("Encoding failed.")
+    finally:
+        stopped.set()
+        if proc.poll() is None:
+            proc.kill()
+        proc.wait()
+        proc.stdout.close()
+
+
+def maybe_encode(wav_path: str, output_format: str) -> str:
+    """Encode a WAV file to `output_format` and delete the WAV. WAV input is returned unchanged.
+
+    Uses oneshot_encoder_pool, so it never queues behind audiobook chapter encoders.
+    """
+    if output_format == "WAV":
+        return wav_path
+
+    output_path = os.path.splitext(wav_path)[0] + output_extension(output_format)
+    info = sf.info(wav_path)
+    with oneshot_encoder_pool.open(output_path, output_format, info.samplerate) as encoder:
+        for block in sf.blocks(wav_path, blocksize=65536, dtype="float32"):
+            encoder.write(block)
+    os.remove(wav_path)
+    return output_path
+
+
+def concat_with_chapters(
+    chapters: list[dict],
+    output_path: str,
+    package: str,
+    chapter_format: str,
+    title: str = "",
+) -> str:
+    """Join chapter files into one M4B or MP3 with a chapter marker per file.
+
+    `chapters` are dicts with "title", "path" and "duration" (seconds), in
+    order. ffmpeg's concat demuxer streams the files one after another; when
+    they are already in the package's codec they are copied, not re-encoded.
+    Returns output_path.
+    """
+    if not check_ffmpeg():
+        raise RuntimeError(
+            "ffmpeg is not installed. Install with `brew install ffmpeg`."
+        )
+    _, muxer, codec = PACKAGES[package]
+    codec_args = ["-codec:a", "copy"] if chapter_format == codec else list(ENCODINGS[codec][2])
+    if muxer == "mp3":
+        codec_args += ["-id3v2_version", "3"]
+
+    list_path = output_path + ".concat.txt"
+    meta_path = output_path + ".ffmetadata"
+    tmp_path = output_path + ".part"
+    with open(list_path, "w") as f:
+        for ch in chapters:
+            escaped = os.path.abspath(ch["path"]).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+    with open(meta_path, "w") as f:
+        f.write(_ffmetadata(chapters, title))
+
+    try:
+        subprocess.run(
+            [
+                "ffmpeg", "-hide_banner", "-loglevel", "error",
+                "-f", "concat", "-safe", "0", "-i", list_path,
+                "-i", meta_path, "-map", "0:a", "-map_metadata", "1", "-map_chapters", "1",
+                *codec_args, "-f", muxer, "-y", tmp_path,
+            ],
+            capture_output=True,
+            check=True,
+        )
+        os.replace(tmp_path, output_path)
+    finally:
+        for path in (list_path, meta_path, tmp_path):
+            if os.path.exists(path):
+                os.remove(path)
+    return output_path
+
+
+def _ffmetadata(chapters: list[dict], title: str) -> str:
+    """Build an ffmetadata document with one [CHAPTER] per entry (millisecond timebase)."""
+    lines = [";FFMETADATA1"]
+    if title:
+        lines.append(f"title={_ffmetadata_escape(title)}")
+    start = 0
+    for ch in chapters:
+        end = start + round(ch["duration"] * 1000)
+        lines += [
+            "[CHAPTER]",
+            "TIMEBASE=1/1000",
+            f"START={start}",
+            f"END={end}",
+            f"title={_ffmetadata_escape(ch['title'])}",
+        ]
+        start = end
+    return "\n".join(lines) + "\n"
+
+
+def _ffmetadata_escape(value: str) -> str:
+    for char in ("\\", "=", ";", "#", "\n"):
+        value = value.replace(char, "\\" + char)
+    return value
+
+
+def _close(chunks) -> None:
+    close = getattr(chunks, "close", None)
+    if close is not None:
+        close()
+
+
+def _lame_encoder(sample_rate: int):
+    """Return an in-process lameenc MP3 encoder, or None if lameenc isn't installed."""
+    try:
+        import lameenc
+    except ImportError:
+        return None
+    encoder = lameenc.Encoder()
+    encoder.set_bit_rate(_MP3_KBPS)
+    encoder.set_in_sample_rate(sample_rate)
+    encoder.set_channels(1)
+    encoder.set_quality(2)
+    return encoder
+
+
+# Singletons: chapter encoders, and one-shot conversions kept out of their way
+encoder_pool = EncoderPool()
+oneshot_encoder_pool = EncoderPool(ONESHOT_ENCODER_POOL_SIZE)
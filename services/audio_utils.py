@@ -1,12 +1,20 @@
 import os
 import shutil
 import subprocess
+import threading
 import zipfile
+from collections import OrderedDict
 
 import numpy as np
 import soundfile as sf
 
-from config import DEFAULT_SAMPLE_RATE, OUTPUT_DIR
+from config import DEFAULT_SAMPLE_RATE, OUTPUT_DIR, REFERENCE_CACHE_DIR
+from services.hashing import file_sha256
+
+# (path, mtime_ns, size) -> (content hash, normalized WAV path), LRU first
+_REFERENCE_MEMO_MAX = 256
+_reference_memo: OrderedDict[tuple[str, int, int], tuple[str, str]] = OrderedDict()
+_reference_lock = threading.Lock()
 
 
 def check_ffmpeg() -> bool:
@@ -14,29 +22,6 @@ def check_ffmpeg() -> bool:
     return shutil.which("ffmpeg") is not None
 
 
-def convert_to_mp3(wav_path: str, mp3_path: str | None = None, bitrate: str = "192k") -> str:
-    """Convert a WAV file to MP3 using ffmpeg. Returns the MP3 path."""
-    if not check_ffmpeg():
-        raise RuntimeError(
-            "ffmpeg is not installed. Install with `brew install ffmpeg`."
-        )
-    if mp3_path is None:
-        mp3_path = os.path.splitext(wav_path)[0] + ".mp3"
-    subprocess.run(
-        ["ffmpeg", "-i", wav_path, "-codec:a", "libmp3lame", "-b:a", bitrate, "-y", mp3_path],
-        capture_output=True,
-        check=True,
-    )
-    return mp3_path
-
-
-def maybe_convert_to_mp3(wav_path: str, output_format: str) -> str:
-    """Convert to MP3 if requested, otherwise return wav_path unchanged."""
-    if output_format == "MP3":
-        return convert_to_mp3(wav_path)
-    return wav_path
-
-
 def ensure_wav(path: str) -> str:
     """Ensure an audio file is in WAV format miniaudio can decode.
 
@@ -76,6 +61,81 @@ def ensure_wav(path: str) -> str:
         )
 
 
+def prepare_reference(path: str) -> tuple[str, str]:
+    """Normalize a reference clip once per distinct content.
+
+    Returns (content hash, path to a mono 24 kHz WAV in REFERENCE_CACHE_DIR).
+    Repeat calls for an unchanged file cost a single stat(); a different file
+    with the same content reuses the already-normalized WAV.
+    """
+    st = os.stat(path)
+    memo_key = (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+    with _reference_lock:
+        if memo_key in _reference_memo:
+            _reference_memo.move_to_end(memo_key)
+            return _reference_memo[memo_key]
+
+    content_hash = file_sha256(path)
+    normalized = os.path.join(REFERENCE_CACHE_DIR, f"{content_hash}.wav")
+    if not os.path.exists(normalized):
+        tmp_path = f"{normalized}.{threading.get_ident()}.tmp.wav"
+        try:
+            _normalize_reference(path, tmp_path)
+            os.replace(tmp_path, normalized)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    _remember_reference(memo_key, content_hash, normalized)
+    return content_hash, normalized
+
+
+def register_reference(path: str, content_hash: str) -> None:
+    """Record an already-normalized reference WAV so prepare_reference() needn't hash or convert it."""
+    st = os.stat(path)
+    _remember_reference((os.path.abspath(path), st.st_mtime_ns, st.st_size), content_hash, path)
+
+
+def _remember_reference(memo_key: tuple[str, int, int], content_hash: str, path: str) -> None:
+    with _reference_lock:
+        _reference_memo[memo_key] = (content_hash, path)
+        _reference_memo.move_to_end(memo_key)
+        while len(_reference_memo) > _REFERENCE_MEMO_MAX:
+            _reference_memo.popitem(last=False)
+
+
+def _normalize_reference(path: str, output_path: str) -> None:
+    """Write `path` as a mono WAV at DEFAULT_SAMPLE_RATE, with ffmpeg when it is available."""
+    if check_ffmpeg():
+        try:
+            subprocess.run(
+                ["ffmpeg", "-i", path, "-ar", str(DEFAULT_SAMPLE_RATE), "-ac", "1", "-y", output_path],
+                capture_output=True,
+                check=True,
+            )
+            return
+        except subprocess.CalledProcessError:
+            pass
+
+    # Without ffmpeg: soundfile decode + downmix + linear resample, so the
+    # cached WAV has the same format either way
+    try:
+        data, sr = sf.read(path, dtype="float32")
+    except Exception as e:
+        raise ValueError(
+            f"Could not convert audio file to WAV. "
+            f"Please upload a WAV, MP3, or FLAC file. ({e})"
+        )
+    if data.ndim > 1:
+        data = data.mean(axis=1)
+    if sr != DEFAULT_SAMPLE_RATE and len(data):
+        n_out = max(1, round(len(data) * DEFAULT_SAMPLE_RATE / sr))
+        data = np.interp(
+            np.arange(n_out) * (sr / DEFAULT_SAMPLE_RATE), np.arange(len(data)), data,
+        ).astype(np.float32)
+    sf.write(output_path, data, DEFAULT_SAMPLE_RATE)
+
+
 def save_audio(audio_array, path: str, sample_rate: int = DEFAULT_SAMPLE_RATE) -> str:
     """Save an mx.array or numpy array to a WAV file."""
     if not isinstance(audio_array, np.ndarray):
@@ -87,35 +147,124 @@ def save_audio(audio_array, path: str, sample_rate: int = DEFAULT_SAMPLE_RATE) -
     return path
 
 
+def pcm16_bytes(audio) -> bytes:
+    """Convert float audio to mono 16-bit little-endian PCM bytes."""
+    data = np.asarray(audio, dtype=np.float32)
+    if data.ndim > 1:
+        data = data[:, 0]
+    return (np.clip(data, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+
+
+def wav_header(sample_rate: int, num_frames: int | None = None) -> bytes:
+    """Return a 44-byte header for a mono 16-bit PCM WAV.
+
+    With num_frames=None the sizes are set to the maximum, the usual
+    convention for a WAV streamed before its length is known.
+    """
+    data_size = 0xFFFFFFFF - 36 if num_frames is None else num_frames * 2
+    return b"".join([
+        b"RIFF", (data_size + 36).to_bytes(4, "little"), b"WAVE",
+        b"fmt ", (16).to_bytes(4, "little"), (1).to_bytes(2, "little"), (1).to_bytes(2, "little"),
+        sample_rate.to_bytes(4, "little"), (sample_rate * 2).to_bytes(4, "little"),
+        (2).to_bytes(2, "little"), (16).to_bytes(2, "little"),
+        b"data", data_size.to_bytes(4, "little"),
+    ])
+
+
+class ChapterWriter:
+    """Append audio to a WAV file as it is produced, with silence gaps between appends.
+
+    The file is opened once and each append goes straight to disk, so memory
+    use does not grow with chapter length; the WAV header is finalized on
+    close. With resume_frames, an existing file is reopened and truncated to
+    that many frames (for example, the end of the last chunk recorded before
+    an interruption) and writing continues from there.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        sample_rate: int = DEFAULT_SAMPLE_RATE,
+        silence_ms: int = 250,
+        resume_frames: int | None = None,
+    ):
+        self._silence = np.zeros(int(sample_rate * silence_ms / 1000), dtype=np.float32)
+        if resume_frames:
+            self._file = sf.SoundFile(path, "r+")
+            if self._file.frames < resume_frames or self._file.samplerate != sample_rate:
+                self._file.close()
+                raise ValueError(f"Cannot resume {path}: expected {resume_frames} frames at {sample_rate} Hz.")
+            self._file.truncate(resume_frames)
+            self._file.seek(resume_frames)
+        else:
+            self._file = sf.SoundFile(path, "w", samplerate=sample_rate, channels=1, subtype="PCM_16")
+
+    @property
+    def frames(self) -> int:
+        return self._file.frames
+
+    def append(self, audio) -> int:
+        """Write a silence gap (unless the file is empty) and then `audio`.
+
+        Returns the frame count after the write, which is flushed to disk.
+        """
+        data = np.asarray(audio, dtype=np.float32)
+        if data.ndim > 1:
+            data = data[:, 0]
+        if self._file.frames:
+            self._file.write(self._silence)
+        self._file.write(data)
+        self._file.flush()
+        return self._file.frames
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self) -> "ChapterWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
 def merge_audio_files(
-    paths: list[str],
+    segments: list[str | np.ndarray],
     output_path: str,
     sample_rate: int = DEFAULT_SAMPLE_RATE,
     silence_ms: int = 250,
 ) -> str:
-    """Concatenate WAV files with silence gaps between them."""
-    silence_samples = int(sample_rate * silence_ms / 1000)
-    silence = np.zeros(silence_samples, dtype=np.float32)
-
-    segments = []
-    for p in paths:
-        data, sr = sf.read(p, dtype="float32")
-        if data.ndim > 1:
-            data = data[:, 0]
-        segments.append(data)
-        segments.append(silence)
-
-    if segments:
-        segments.pop()  # remove trailing silence
+    """Concatenate audio with silence gaps between segments.
 
-    merged = np.concatenate(segments) if segments else np.zeros(1, dtype=np.float32)
-    sf.write(output_path, merged, sample_rate)
+    Segments may be WAV file paths or in-memory arrays; they are streamed
+    through a ChapterWriter one at a time.
+    """
+    with ChapterWriter(output_path, sample_rate, silence_ms) as writer:
+        for seg in segments:
+            writer.append(sf.read(seg, dtype="float32")[0] if isinstance(seg, str) else seg)
     return output_path
 
 
 def create_zip(audio_paths: list[str], output_path: str) -> str:
-    """Pack multiple audio files into a ZIP."""
-    with zipfile.ZipFile(output_path, "w", zipfile.ZIP_DEFLATED) as zf:
+    """Pack multiple audio files into a ZIP.
+
+    Audio is already compressed (or incompressible PCM), so entries are
+    stored rather than deflated and packaging stays I/O-bound.
+    """
+    with zipfile.ZipFile(output_path, "w", zipfile.ZIP_STORED) as zf:
         for p in audio_paths:
             zf.write(p, os.path.basename(p))
     return output_path
+
+
+def audio_duration(path: str) -> float:
+    """Return an audio file's duration in seconds, via soundfile or else ffprobe."""
+    try:
+        return sf.info(path).duration
+    except Exception:
+        pass
+    result = subprocess.run(
+        ["ffprobe", "-v", "error", "-show_entries", "format=duration",
+         "-of", "default=noprint_wrappers=1:nokey=1", path],
+        capture_output=True, text=True, check=True,
+    )
+    return float(result.stdout.strip())
@@ -0,0 +1,227 @@
+import json
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Callable
+
+from config import JOBS_DIR
+from services.hashing import text_sha256
+
+MANIFEST_NAME = "manifest.json"
+# Chunks written since the manifest was last saved, one JSON line each
+PROGRESS_NAME = "progress.jsonl"
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def job_id_for(book_hash: str, settings: dict) -> str:
+    """Derive a stable job id from the book contents and render settings."""
+    key = json.dumps({"book": book_hash, "settings": settings}, sort_keys=True)
+    return text_sha256(key)[:16]
+
+
+class AudiobookJob:
+    """Persistent manifest for rendering one book with one set of settings.
+
+    The manifest lives at ``JOBS_DIR/<job_id>/manifest.json`` next to the
+    chapter audio it describes. Each chapter records its chunk list (text
+    hash, length) and which chunks have been appended to its chapter file and
+    where each ends, so an interrupted render resumes by truncating the file
+    to the last recorded chunk and synthesizing only the rest, and a finished
+    book can be re-packaged without any synthesis.
+
+    Written chunks are appended to ``progress.jsonl`` as they happen and
+    folded into the manifest on load and on the next save(), so recording a
+    chunk costs one small append instead of a full manifest rewrite.
+    """
+
+    def __init__(self, manifest: dict, job_dir: str):
+        self._manifest = manifest
+        self._dir = job_dir
+        self._chapters = {c["order"]: c for c in manifest["chapters"]}
+        self._texts: dict[int, list[str]] = {}
+        self._lock = threading.RLock()
+        self._load_progress()
+
+    @classmethod
+    def open(cls, book_hash: str, book_name: str, settings: dict) -> "AudiobookJob":
+        """Load the job for this book and settings, creating it if it doesn't exist."""
+        job_id = job_id_for(book_hash, settings)
+        job_dir = os.path.join(JOBS_DIR, job_id)
+        manifest_path = os.path.join(job_dir, MANIFEST_NAME)
+
+        if os.path.isfile(manifest_path):
+            with open(manifest_path) as f:
+                return cls(json.load(f), job_dir)
+
+        os.makedirs(job_dir, exist_ok=True)
+        manifest = {
+            "job_id": job_id,
+            "book_hash": book_hash,
+            "book_name": book_name,
+            "settings": settings,
+            "chapters": [],
+            "package_path": None,
+            "created_at": _now(),
+            "updated_at": _now(),
+        }
+        job = cls(manifest, job_dir)
+        job.save()
+        return job
+
+    @property
+    def job_id(self) -> str:
+        return self._manifest["job_id"]
+
+    @property
+    def dir(self) -> str:
+        return self._dir
+
+    @property
+    def settings(self) -> dict:
+        return self._manifest["settings"]
+
+    @property
+    def book_name(self) -> str:
+        return self._manifest["book_name"]
+
+    def prepare(self, chapters: list[dict], split_text: Callable[[str], list[str]]) -> tuple[int, int]:
+        """Register chapters and their chunks, keeping finished work whose text is unchanged.
+
+        Returns (chunks already done, total chunks) across `chapters`.
+        """
+        done = total = 0
+        with self._lock:
+            for ch in chapters:
+                order = ch["order"]
+                texts = [c for c in split_text(ch["content"]) if c.strip()]
+                self._texts[order] = texts
+                hashes = [text_sha256(t)[:16] for t in texts]
+
+                entry = self._chapters.get(order)
+                if entry is None:
+                    entry = {"order": order, "title": ch["title"], "status": "pending",
+                             "output_path": None, "error": None, "chunks": [], "written": []}
+                    self._manifest["chapters"].append(entry)
+                    self._chapters[order] = entry
+
+                if [c["hash"] for c in entry["chunks"]] != hashes:
+                    # Text changed: any chapter output is stale, but the chapter
+                    # file is still valid up to the first changed chunk
+                    entry["status"] = "pending"
+                    entry["output_path"] = None
+                entry["chunks"] = [
+                    {"index": i, "hash": h, "chars": len(t)}
+                    for i, (h, t) in enumerate(zip(hashes, texts))
+                ]
+
+                if self.chapter_output(order):
+                    done += len(texts)
+                else:
+                    done += self.resume_point(order)[0]
+                total += len(texts)
+            self._manifest["chapters"].sort(key=lambda c: c["order"])
+            self.save()
+        return done, total
+
+    def chunks(self, order: int) -> list[str]:
+        """Return the chunk texts registered by prepare() for a chapter."""
+        return self._texts.get(order, [])
+
+    def chapter_output(self, order: int) -> str | None:
+        """Return the finished chapter file, or None if it still needs rendering."""
+        entry = self._chapters.get(order)
+        if entry and entry["status"] == "done" and entry["output_path"] and os.path.exists(entry["output_path"]):
+            return entry["output_path"]
+        return None
+
+    def resume_point(self, order: int) -> tuple[int, int]:
+        """Return (chunks already in the chapter file, frames they end at) for a chapter.
+
+        Only the leading chunks whose text still matches what was written count.
+        """
+        with self._lock:
+            entry = self._chapters.get(order)
+            if entry is None or not os.path.exists(self.chapter_path(order)):
+                return 0, 0
+            count = frames = 0
+            for written, chunk in zip(entry.get("written", []), entry["chunks"]):
+                if written["hash"] != chunk["hash"]:
+                    break
+                count += 1
+                frames = written["end"]
+            return count, frames
+
+    def record_chunk(self, order: int, index: int, end_frame: int) -> None:
+        """Record that chunk `index` was appended to the chapter file, ending at `end_frame`."""
+        with self._lock:
+            chunk_hash = self._chapters[order]["chunks"][index]["hash"]
+            self._apply_written(order, index, chunk_hash, end_frame)
+            line = json.dumps({"order": order, "index": index, "hash": chunk_hash, "end": end_frame})
+            with open(os.path.join(self._dir, PROGRESS_NAME), "a") as f:
+                f.write(line + "\n")
+
+    def chapter_path(self, order: int, ext: str = ".wav") -> str:
+        """Return where a chapter's merged audio should be written."""
+        return os.path.join(self._dir, f"ch{order:03d}{ext}")
+
+    def finish_chapter(self, order: int, output_path: str, duration: float | None = None) -> None:
+        """Record a chapter's final file and its duration in seconds."""
+        with self._lock:
+            self._chapters[order].update(status="done", output_path=output_path, duration=duration, error=None)
+            self.save()
+
+    def chapter_duration(self, order: int) -> float | None:
+        """Return a finished chapter's recorded duration in seconds, if known."""
+        entry = self._chapters.get(order)
+        return entry.get("duration") if entry else None
+
+    def fail_chapter(self, order: int, error: str) -> None:
+        with self._lock:
+            self._chapters[order].update(status="failed", error=error)
+            self.save()
+
+    def package_path(self, ext: str = ".zip") -> str:
+        return os.path.join(self._dir, f"audiobook_{self.job_id}{ext}")
+
+    def set_packaged(self, path: str | None) -> None:
+        with self._lock:
+            self._manifest["package_path"] = path
+            self.save()
+
+    def save(self) -> None:
+        """Atomically rewrite the manifest, which then holds everything in the progress log."""
+        with self._lock:
+            self._manifest["updated_at"] = _now()
+            manifest_path = os.path.join(self._dir, MANIFEST_NAME)
+            tmp_path = manifest_path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self._manifest, f, indent=2)
+            os.replace(tmp_path, manifest_path)
+            try:
+                os.remove(os.path.join(self._dir, PROGRESS_NAME))
+            except FileNotFoundError:
+                pass
+
+    def _apply_written(self, order: int, index: int, chunk_hash: str, end_frame: int) -> None:
+        written = self._chapters[order].setdefault("written", [])
+        del written[index:]
+        written.append({"hash": chunk_hash, "end": end_frame})
+
+    def _load_progress(self) -> None:
+        """Fold chunks recorded since the last save into the manifest (replaying is idempotent)."""
+        try:
+            with open(os.path.join(self._dir, PROGRESS_NAME)) as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return
+        for line in lines:
+            try:
+                item = json.loads(line)
+            except ValueError:
+                # A line cut short by a crash; nothing after it was recorded
+                break
+            if item["order"] in self._chapters:
+                self._apply_written(item["order"], item["index"], item["hash"], item["end"])
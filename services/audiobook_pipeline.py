@@ -0,0 +1,298 @@
+import heapq
+import os
+import queue
+import threading
+import zipfile
+from typing import Callable, Iterator
+
+import numpy as np
+
+from config import AUDIOBOOK_POSTPROCESS_WORKERS, AUDIOBOOK_QUEUE_SIZE, DEFAULT_SAMPLE_RATE
+from services.audio_encoder import PACKAGES, concat_with_chapters, encoder_pool, output_extension
+from services.audio_utils import ChapterWriter, audio_duration
+from services.audiobook_jobs import AudiobookJob
+
+_STOP = object()
+_DONE = object()
+_HANDED_OVER = object()
+
+
+class AudiobookPipeline:
+    """Render chapters through overlapping synthesis, writing and packaging stages.
+
+    Synthesis runs on a single thread, since it is accelerator-bound, and
+    hands `synthesize_chunks` up to `batch_size` missing chunks of a chapter
+    at a time (it returns one audio array per chunk; see
+    synthesis_batch_size() for choosing the size). Each chapter is handed
+    over a bounded queue to a pool of writer workers, which append its
+    chunks as they arrive to a ChapterWriter (WAV) or a pooled
+    StreamingEncoder (MP3/Opus/AAC, no intermediate WAV), so memory stays
+    flat however long the chapter is. Finished chapters are appended to the
+    ZIP by a packaging thread. Writing and encoding one chapter therefore
+    overlaps synthesis of the next.
+
+    With packaging="ZIP" chapter files are stored (not deflated) into a ZIP
+    as they finish; with "M4B" or "MP3" they are joined into one file with a
+    chapter marker per chapter once all are done.
+
+    Progress is recorded in the job manifest as it happens: finished chapters
+    are reused. An interrupted WAV chapter resumes after its last recorded
+    chunk; an interrupted encoded chapter is rendered again from the start.
+    """
+
+    def __init__(
+        self,
+        job: AudiobookJob,
+        synthesize_chunks: Callable[[list[str]], list[np.ndarray]],
+        output_format: str = "WAV",
+        packaging: str = "ZIP",
+        sample_rate: int = DEFAULT_SAMPLE_RATE,
+        postprocess_workers: int = AUDIOBOOK_POSTPROCESS_WORKERS,
+        queue_size: int = AUDIOBOOK_QUEUE_SIZE,
+        batch_size: int = 1,
+    ):
+        self._job = job
+        self._synthesize_chunks = synthesize_chunks
+        self._batch_size = max(1, batch_size)
+        self._output_format = output_format
+        self._packaging = packaging
+        self._sample_rate = sample_rate
+        self._workers = max(1, postprocess_workers)
+        self._synth_queue: queue.Queue = queue.Queue(maxsize=max(1, queue_size))
+        self._package_queue: queue.Queue = queue.Queue()
+        self._events: queue.Queue = queue.Queue()
+        self._stop = threading.Event()
+
+        self.chapter_paths: list[str] = []
+        self.package_path: str | None = None
+        self.completed = 0
+
+    def run(self, chapters: list[dict]) -> Iterator[str]:
+        """Render `chapters`, yielding status lines as the stages make progress.
+
+        The chapters must have been registered with job.prepare(). When the
+        iterator finishes, chapter_paths holds the rendered chapter
+        files in chapter order and package_path the ZIP or single-file
+        audiobook (None if no chapter succeeded). Closing the iterator early stops synthesis.
+        """
+        threads = [
+            threading.Thread(
+                target=self._synthesis_stage, args=(chapters,),
+                name="audiobook-synthesis", daemon=True,
+            ),
+            threading.Thread(
+                target=self._packaging_stage, args=(chapters,),
+                name="audiobook-packaging", daemon=True,
+            ),
+        ]
+        threads += [
+            threading.Thread(
+                target=self._writer_worker,
+                name=f"audiobook-writer-{i}", daemon=True,
+            )
+            for i in range(self._workers)
+        ]
+        for t in threads:
+            t.start()
+
+        try:
+            while True:
+                event = self._events.get()
+                if event is _DONE:
+                    break
+                yield event
+        finally:
+            self._stop.set()
+
+    def stop(self) -> None:
+        """Stop synthesis after the current chunk; safe to call from any thread.
+
+        The chapter in progress is recorded as failed (a WAV chapter resumes
+        from its last chunk next time), later chapters are left for a later
+        run and no single-file package is joined. run() still finishes.
+        """
+        self._stop.set()
+
+    # ── Stages ────────────────────────────────────────────────────────────
+
+    def _synthesis_stage(self, chapters: list[dict]) -> None:
+        total = len(chapters)
+        try:
+            for index, ch in enumerate(chapters):
+                # Every chapter reaches packaging exactly once: from here,
+                # unless a writer worker has taken it over
+                path = None
+                try:
+                    path = self._synthesize_chapter(index, ch, total)
+                except Exception as e:
+                    self._report_failure(ch, e)
+                if path is not _HANDED_OVER:
+                    self._package_queue.put((index, path))
+        finally:
+            for _ in range(self._workers):
+                self._synth_queue.put(_STOP)
+
+    def _synthesize_chapter(self, index: int, ch: dict, total: int):
+        """Synthesize one chapter into a writer worker.
+
+        Returns the path of a chapter an earlier run finished, None for one
+        with nothing to render, or _HANDED_OVER once a writer worker owns the
+        chapter and will report it to packaging.
+        """
+        if self._stop.is_set():
+            return None
+
+        title = ch["title"]
+        order = ch["order"]
+        done_path = self._job.chapter_output(order)
+        if done_path:
+            self._events.put(f"[{index + 1}/{total}] Already rendered: {title}")
+            return done_path
+
+        texts = self._job.chunks(order)
+        if not texts:
+            self._events.put(f"  Skipped (empty): {title}")
+            return None
+
+        self._events.put(f"[{index + 1}/{total}] Generating: {title}")
+        sink, start = self._open_chapter(order, len(texts))
+
+        # Handed over before synthesis starts so a worker writes chunks
+        # as they arrive; blocks when the workers fall behind (bounded queue)
+        chunks: queue.Queue = queue.Queue(maxsize=self._batch_size * 2)
+        failed = threading.Event()
+        self._synth_queue.put((index, ch, sink, chunks, failed))
+        try:
+            for batch_start in range(start, len(texts), self._batch_size):
+                if self._stop.is_set() or failed.is_set():
+                    raise RuntimeError("Stopped before the chapter finished.")
+                batch = range(batch_start, min(batch_start + self._batch_size, len(texts)))
+                for ci, audio in zip(batch, self._synthesize_chunks([texts[ci] for ci in batch])):
+                    chunks.put((ci, audio))
+            chunks.put(_STOP)
+        except Exception as e:
+            chunks.put(e)
+        return _HANDED_OVER
+
+    def _open_chapter(self, order: int, n_chunks: int) -> tuple:
+        """Open the chapter's output for appending. Returns (writer, first chunk to synthesize).
+
+        WAV chapters resume after the last chunk an earlier run recorded;
+        encoded chapters are always rendered from the start.
+        """
+        if self._output_format != "WAV":
+            path = self._job.chapter_path(order, output_extension(self._output_format))
+            return encoder_pool.open(path, self._output_format, self._sample_rate), 0
+
+        path = self._job.chapter_path(order)
+        start, frames = self._job.resume_point(order)
+        try:
+            writer = ChapterWriter(path, self._sample_rate, resume_frames=frames if start else None)
+        except (ValueError, RuntimeError):
+            # Chapter file is shorter than recorded or unreadable: start over
+            start = 0
+            writer = ChapterWriter(path, self._sample_rate)
+        if start:
+            self._events.put(f"  Resuming at chunk {start + 1}/{n_chunks}")
+        return writer, start
+
+    def _writer_worker(self) -> None:
+        while True:
+            item = self._synth_queue.get()
+            if item is _STOP:
+                return
+            index, ch, sink, chunks, failed = item
+            path = None
+            ended = False
+            try:
+                with sink:
+                    while True:
+                        chunk = chunks.get()
+                        ended = chunk is _STOP or isinstance(chunk, Exception)
+                        if chunk is _STOP:
+                            break
+                        if ended:
+                            raise chunk
+                        ci, audio = chunk
+                        end_frame = sink.append(audio)
+                        if isinstance(sink, ChapterWriter):
+                            self._job.record_chunk(ch["order"], ci, end_frame)
+                path = self._job.chapter_path(ch["order"], output_extension(self._output_format))
+                self._job.finish_chapter(ch["order"], path, duration=sink.frames / self._sample_rate)
+                self._events.put(f"  Done: {ch['title']}")
+            except Exception as e:
+                failed.set()
+                if not ended:
+                    _drain(chunks)
+                self._report_failure(ch, e)
+                path = None
+            finally:
+                self._package_queue.put((index, path))
+
+    def _packaging_stage(self, chapters: list[dict]) -> None:
+        """Package finished chapters in chapter order as they arrive."""
+        pending: list[tuple[int, str | None]] = []
+        next_index = 0
+        entries = []
+        zip_path = self._job.package_path(".zip")
+        zf = None
+        try:
+            while next_index < len(chapters):
+                heapq.heappush(pending, self._package_queue.get())
+                while pending and pending[0][0] == next_index:
+                    index, path = heapq.heappop(pending)
+                    next_index += 1
+                    self.completed += 1
+                    if path is None:
+                        continue
+                    self.chapter_paths.append(path)
+                    if self._packaging != "ZIP":
+                        entries.append(self._chapter_entry(chapters[index], path))
+                        continue
+                    if zf is None:
+                        zf = zipfile.ZipFile(zip_path, "w", zipfile.ZIP_STORED)
+                    zf.write(path, os.path.basename(path))
+
+            if zf is not None:
+                zf.close()
+                self.package_path = zip_path
+            elif entries and not self._stop.is_set():
+                self._events.put(f"Joining {len(entries)} chapters into {self._packaging}...")
+                self.package_path = concat_with_chapters(
+                    entries,
+                    self._job.package_path(PACKAGES[self._packaging][0]),
+                    self._packaging,
+                    self._output_format,
+                    title=self._job.book_name,
+                )
+            if self.package_path:
+                self._job.set_packaged(self.package_path)
+        except Exception as e:
+            self._events.put(f"  FAILED: packaging — {e}")
+        finally:
+            if zf is not None:
+                zf.close()
+            self._events.put(_DONE)
+
+    def _report_failure(self, ch: dict, error: Exception) -> None:
+        """Record a failed chapter; a bookkeeping error here must not stop the stages."""
+        self._events.put(f"  FAILED: {ch['title']} — {error}")
+        try:
+            self._job.fail_chapter(ch["order"], str(error))
+        except Exception:
+            pass
+
+    def _chapter_entry(self, ch: dict, path: str) -> dict:
+        """Describe a finished chapter for a chaptered single-file package."""
+        duration = self._job.chapter_duration(ch["order"])
+        if duration is None:
+            duration = audio_duration(path)
+        return {"title": ch["title"], "path": path, "duration": duration}
+
+
+def _drain(chunks: queue.Queue) -> None:
+    """Discard a chapter's remaining chunks up to its end marker, unblocking synthesis."""
+    while True:
+        item = chunks.get()
+        if item is _STOP or isinstance(item, Exception):
+            return
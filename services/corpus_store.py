@@ -0,0 +1,166 @@
+import json
+import multiprocessing
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timezone
+from typing import Iterator
+
+from config import CORPUS_DIR, DEFAULT_CHUNK_CHARS, INGEST_WORKERS
+from services.epub_parser import chapter_text, index_file
+from services.hashing import file_sha256
+from services.text_chunker import chunk_spans, chunk_text, clean_text
+
+MANIFEST_NAME = "book.json"
+
+
+def ingest_books(
+    paths: list[str],
+    max_chars: int = DEFAULT_CHUNK_CHARS,
+    workers: int = INGEST_WORKERS,
+    force: bool = False,
+) -> Iterator[dict]:
+    """Parse, normalize and chunk many EPUB/TXT files in parallel into the corpus store.
+
+    Each book is handled by one worker process (HTML parsing is CPU-bound
+    pure Python, so threads would not help). Yields one result per book as
+    it finishes: the stored manifest plus "path" and "cached" (already in
+    the store), or {"path", "error"} if the book could not be ingested.
+    Books already stored are skipped unless `force` is set.
+    """
+    paths = list(dict.fromkeys(paths))
+    if not paths:
+        return
+    workers = max(1, min(workers, len(paths)))
+    if workers == 1:
+        for path in paths:
+            yield _ingest_result(path, max_chars, force)
+        return
+
+    # spawn, not fork: the parent may be a threaded server holding model state
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        futures = {pool.submit(_ingest_result, path, max_chars, force): path for path in paths}
+        for future in as_completed(futures):
+            try:
+                yield future.result()
+            except Exception as e:
+                # The worker process itself died (e.g. out of memory)
+                yield {"path": futures[future], "error": str(e)}
+
+
+def list_books() -> list[dict]:
+    """Return the manifests of all stored books, most recently ingested first."""
+    books = []
+    for name in os.listdir(CORPUS_DIR):
+        manifest = load_book(name)
+        if manifest is not None:
+            books.append(manifest)
+    books.sort(key=lambda b: b["ingested_at"], reverse=True)
+    return books
+
+
+def load_book(book_hash: str) -> dict | None:
+    """Return a stored book's manifest, or None if it isn't (fully) ingested."""
+    try:
+        with open(os.path.join(CORPUS_DIR, book_hash, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def book_chapters(book_hash: str) -> list[dict]:
+    """Return a stored book's chapters as {"title", "order", "content"} dicts, in order."""
+    manifest = load_book(book_hash)
+    if manifest is None:
+        raise KeyError(f"Book {book_hash} is not in the corpus.")
+    return [
+        {"title": ch["title"], "order": ch["order"], "content": _read_chapter(book_hash, ch["order"])}
+        for ch in manifest["chapters"]
+    ]
+
+
+def chapter_chunks(book_hash: str, order: int, max_chars: int | None = None) -> list[str]:
+    """Return a stored chapter's chunks, re-chunking if max_chars differs from the stored size."""
+    manifest = load_book(book_hash)
+    if manifest is None:
+        raise KeyError(f"Book {book_hash} is not in the corpus.")
+    entry = next((ch for ch in manifest["chapters"] if ch["order"] == order), None)
+    if entry is None:
+        raise KeyError(f"Chapter {order} not found.")
+    text = _read_chapter(book_hash, order)
+    if max_chars is not None and max_chars != manifest["chunk_chars"]:
+        return chunk_text(text, max_chars)
+    return [text[start:end] for start, end in entry["chunks"]]
+
+
+def remove_book(book_hash: str) -> None:
+    shutil.rmtree(os.path.join(CORPUS_DIR, book_hash), ignore_errors=True)
+
+
+# ── Worker ────────────────────────────────────────────────────────────────
+
+
+def _ingest_result(path: str, max_chars: int, force: bool) -> dict:
+    """Process-pool entry point: ingest one book, reporting failure as a result."""
+    try:
+        return _ingest_book(path, max_chars, force)
+    except Exception as e:
+        return {"path": path, "error": f"{type(e).__name__}: {e}"}
+
+
+def _ingest_book(path: str, max_chars: int, force: bool) -> dict:
+    """Parse one book and write its chapter texts and manifest under CORPUS_DIR/<hash>/.
+
+    The manifest is written last, so a book only counts as stored once all
+    of its chapters are on disk.
+    """
+    book_hash = file_sha256(path)
+    if not force:
+        existing = load_book(book_hash)
+        if existing is not None and existing["chunk_chars"] == max_chars:
+            return {**existing, "path": path, "cached": True}
+
+    book_dir = os.path.join(CORPUS_DIR, book_hash)
+    os.makedirs(book_dir, exist_ok=True)
+    chapters = []
+    for ch in index_file(path, book_hash):
+        text = clean_text(chapter_text(path, book_hash, ch["order"]))
+        if not text:
+            continue
+        _write_atomic(_chapter_path(book_hash, ch["order"]), text)
+        chapters.append({
+            "order": ch["order"],
+            "title": ch["title"],
+            "chars": len(text),
+            "chunks": chunk_spans(text, max_chars),
+        })
+
+    manifest = {
+        "hash": book_hash,
+        "name": os.path.basename(path),
+        "source": os.path.abspath(path),
+        "chunk_chars": max_chars,
+        "chars": sum(ch["chars"] for ch in chapters),
+        "chunk_count": sum(len(ch["chunks"]) for ch in chapters),
+        "chapters": chapters,
+        "ingested_at": datetime.now(timezone.utc).isoformat(),
+    }
+    _write_atomic(os.path.join(book_dir, MANIFEST_NAME), json.dumps(manifest, indent=2))
+    return {**manifest, "path": path, "cached": False}
+
+
+def _chapter_path(book_hash: str, order: int) -> str:
+    return os.path.join(CORPUS_DIR, book_hash, f"ch{order:03d}.txt")
+
+
+def _read_chapter(book_hash: str, order: int) -> str:
+    with open(_chapter_path(book_hash, order), encoding="utf-8") as f:
+        return f.read()
+
+
+def _write_atomic(path: str, text: str) -> None:
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
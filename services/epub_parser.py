@@ -1,83 +1,308 @@
+import html
 import os
+import posixpath
 import re
+import threading
+import zipfile
+from collections import OrderedDict
+from urllib.parse import unquote
+from xml.etree import ElementTree
 
-from bs4 import BeautifulSoup
+from services.hashing import file_sha256
+from services.text_chunker import chunk_spans
 
+# Parsed books are cached by content hash: the chapter index for recent
+# books, and the extracted text of recently used chapters.
+_INDEX_CACHE_MAX = 8
+_TEXT_CACHE_MAX = 64
+_indexes: OrderedDict[str, dict] = OrderedDict()
+_texts: OrderedDict[tuple[str, int], str] = OrderedDict()
+_cache_lock = threading.Lock()
 
-def parse_epub(path: str) -> list[dict]:
-    """Parse an EPUB file into a list of chapters."""
-    import ebooklib
-    from ebooklib import epub
+_MIN_CHAPTER_CHARS = 20
+# Without a TOC, spine documents shorter than this join a neighbouring chapter
+_MERGE_BELOW_CHARS = 1000
+_HEADING_RE = re.compile(rb"<h[1-3][^>]*>(.*?)</h[1-3]\s*>", re.IGNORECASE | re.DOTALL)
+_SKIP_RE = re.compile(rb"<(script|style|head)\b.*?</\1\s*>", re.IGNORECASE | re.DOTALL)
+_TAG_RE = re.compile(rb"<[^>]+>")
+
+
+def index_file(path: str, content_hash: str | None = None) -> list[dict]:
+    """Build (or fetch from cache) the chapter index for an EPUB or text file.
+
+    Each entry has order, title, chars (approximate text length) and where
+    the chapter lives in the file (hrefs of its documents for EPUB,
+    start/end offsets for text). No chapter text is kept; use chapter_text() to load it.
+    """
+    content_hash = content_hash or file_sha256(path)
+    with _cache_lock:
+        cached = _indexes.get(content_hash)
+        if cached is not None:
+            _indexes.move_to_end(content_hash)
+            return [dict(ch) for ch in cached["chapters"]]
+
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".epub":
+        chapters = _index_epub(path)
+    elif ext in (".txt", ".text"):
+        chapters = _index_text(path)
+    else:
+        raise ValueError(f"Unsupported file type: {ext}")
+
+    with _cache_lock:
+        _indexes[content_hash] = {"chapters": chapters}
+        while len(_indexes) > _INDEX_CACHE_MAX:
+            _indexes.popitem(last=False)
+    return [dict(ch) for ch in chapters]
+
+
+def chapter_text(path: str, content_hash: str, order: int) -> str:
+    """Extract one chapter's text from an indexed file, caching the result."""
+    key = (content_hash, order)
+    with _cache_lock:
+        if key in _texts:
+            _texts.move_to_end(key)
+            return _texts[key]
+
+    entries = {ch["order"]: ch for ch in index_file(path, content_hash)}
+    if order not in entries:
+        raise KeyError(f"Chapter {order} not found.")
+    entry = entries[order]
+
+    if "hrefs" in entry:
+        with zipfile.ZipFile(path) as zf:
+            text = "\n\n".join(filter(None, (_html_text(zf.read(href)) for href in entry["hrefs"])))
+    else:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            text = f.read()[entry["start"]:entry["end"]].strip()
+
+    with _cache_lock:
+        _texts[key] = text
+        while len(_texts) > _TEXT_CACHE_MAX:
+            _texts.popitem(last=False)
+    return text
+
+
+def parse_file(path: str) -> list[dict]:
+    """Parse an EPUB or text file into chapters with their full text.
+
+    Prefer index_file() + chapter_text() when only some chapters are needed.
+    """
+    content_hash = file_sha256(path)
+    return [
+        {"title": ch["title"], "content": chapter_text(path, content_hash, ch["order"]), "order": ch["order"]}
+        for ch in index_file(path, content_hash)
+    ]
+
+
+# ── EPUB ──────────────────────────────────────────────────────────────────
+
+
+def _index_epub(path: str) -> list[dict]:
+    """Index an EPUB into chapters without building a DOM for any content document.
+
+    Chapter boundaries come from the table of contents (EPUB 3 nav, else
+    NCX) laid over the spine: each document a TOC entry points into starts
+    a chapter, and the documents after it up to the next such document
+    (split-off fragments, notes, part pages) are merged into it. Books
+    without a usable TOC get one chapter per spine document, with documents
+    under _MERGE_BELOW_CHARS merged into the preceding chapter.
+    """
+    with zipfile.ZipFile(path) as zf:
+        spine, toc = _epub_package(zf)
+        sizes = {}
+        headings = {}
+        for href in spine:
+            raw = zf.read(href)
+            sizes[href] = len(_rough_text(raw))
+            heading = _HEADING_RE.search(raw)
+            headings[href] = _rough_text(heading.group(1)) if heading else ""
+
+    groups = _toc_groups(spine, toc, sizes) or _size_groups(spine, sizes)
 
-    book = epub.read_epub(path, options={"ignore_ncx": True})
     chapters = []
-    order = 0
+    for title, hrefs in groups:
+        chars = sum(sizes[h] for h in hrefs)
+        if chars < _MIN_CHAPTER_CHARS:
+            continue
+        title = title or next((headings[h] for h in hrefs if headings[h]), "") or f"Chapter {len(chapters) + 1}"
+        chapters.append({"title": title, "order": len(chapters), "chars": chars, "hrefs": hrefs})
+    return chapters
+
+
+def _toc_groups(
+    spine: list[str],
+    toc: list[tuple[str, str]],
+    sizes: dict[str, int],
+) -> list[tuple[str, list[str]]]:
+    """Group spine documents into (TOC title, hrefs) chapters. Empty if the TOC matches no document."""
+    starts = {}
+    for href, label in toc:
+        starts.setdefault(href, label)
+    if not any(href in starts for href in spine):
+        return []
+
+    groups: list[tuple[str, list[str]]] = []
+    for href in spine:
+        if href in starts or not groups:
+            # Front matter before the first TOC entry becomes its own chapter
+            groups.append((starts.get(href, ""), [href]))
+        else:
+            groups[-1][1].append(href)
+
+    # Short front matter (cover, title page) is read with the first chapter
+    if len(groups) > 1 and spine[0] not in starts and sum(sizes[h] for h in groups[0][1]) < _MERGE_BELOW_CHARS:
+        front = groups.pop(0)
+        groups[0] = (groups[0][0], front[1] + groups[0][1])
+    return groups
 
-    for item in book.get_items_of_type(ebooklib.ITEM_DOCUMENT):
-        content = item.get_content().decode("utf-8", errors="replace")
-        soup = BeautifulSoup(content, "html.parser")
-        text = soup.get_text(separator="\n", strip=True)
-        text = re.sub(r"\n{3,}", "\n\n", text).strip()
 
-        if len(text) < 20:
+def _size_groups(spine: list[str], sizes: dict[str, int]) -> list[tuple[str, list[str]]]:
+    """One chapter per spine document, merging tiny documents into the preceding chapter."""
+    groups: list[tuple[str, list[str]]] = []
+    for href in spine:
+        if groups and sizes[href] < _MERGE_BELOW_CHARS:
+            groups[-1][1].append(href)
+        elif groups and sum(sizes[h] for h in groups[-1][1]) < _MERGE_BELOW_CHARS:
+            # A tiny leading document (title page, part page) joins the next one
+            groups[-1][1].append(href)
+        else:
+            groups.append(("", [href]))
+    return groups
+
+
+def _epub_package(zf: zipfile.ZipFile) -> tuple[list[str], list[tuple[str, str]]]:
+    """Read an EPUB's package document.
+
+    Returns the zip paths of the spine's XHTML documents in reading order,
+    and the TOC as (zip path, label) pairs in TOC order (fragments dropped).
+    """
+    container = ElementTree.fromstring(zf.read("META-INF/container.xml"))
+    rootfile = next(el for el in container.iter() if _local(el.tag) == "rootfile")
+    opf_path = rootfile.get("full-path")
+    opf_dir = posixpath.dirname(opf_path)
+    opf = ElementTree.fromstring(zf.read(opf_path))
+
+    manifest = {}
+    nav_path = ncx_path = None
+    for item in opf.iter():
+        if _local(item.tag) != "item":
             continue
+        href = _resolve(opf_dir, item.get("href", ""))
+        media_type = item.get("media-type")
+        if "nav" in (item.get("properties") or "").split():
+            nav_path = href
+        elif media_type == "application/xhtml+xml":
+            manifest[item.get("id")] = href
+        elif media_type == "application/x-dtbncx+xml":
+            ncx_path = href
 
-        title = None
-        heading = soup.find(["h1", "h2", "h3"])
-        if heading:
-            title = heading.get_text(strip=True)
-        if not title:
-            title = f"Chapter {order + 1}"
+    spine = [
+        manifest[ref.get("idref")]
+        for ref in opf.iter()
+        if _local(ref.tag) == "itemref" and ref.get("idref") in manifest
+    ]
+    if not spine:
+        # No usable spine: fall back to manifest order
+        spine = list(manifest.values())
 
-        chapters.append({"title": title, "content": text, "order": order})
-        order += 1
+    toc = []
+    try:
+        if nav_path:
+            toc = _nav_toc(zf, nav_path)
+        if not toc and ncx_path:
+            toc = _ncx_toc(zf, ncx_path)
+    except (KeyError, ElementTree.ParseError):
+        toc = []
+    return spine, toc
+
+
+def _nav_toc(zf: zipfile.ZipFile, nav_path: str) -> list[tuple[str, str]]:
+    """Read the links of an EPUB 3 navigation document's toc nav."""
+    root = ElementTree.fromstring(zf.read(nav_path))
+    navs = [el for el in root.iter() if _local(el.tag) == "nav"]
+    toc_navs = [
+        nav for nav in navs
+        if "toc" in (nav.get("{http://www.idpf.org/2007/ops}type") or "").split()
+    ]
+    base = posixpath.dirname(nav_path)
+    return [
+        (_resolve(base, a.get("href")), "".join(a.itertext()).strip())
+        for nav in (toc_navs or navs)[:1]
+        for a in nav.iter()
+        if _local(a.tag) == "a" and a.get("href")
+    ]
+
+
+def _ncx_toc(zf: zipfile.ZipFile, ncx_path: str) -> list[tuple[str, str]]:
+    """Read the navPoints of an EPUB 2 NCX in document (reading) order."""
+    root = ElementTree.fromstring(zf.read(ncx_path))
+    base = posixpath.dirname(ncx_path)
+    toc = []
+    for point in root.iter():
+        if _local(point.tag) != "navPoint":
+            continue
+        label = next((el for el in point.iter() if _local(el.tag) == "text"), None)
+        content = next((el for el in point if _local(el.tag) == "content"), None)
+        if content is not None and content.get("src"):
+            text = "".join(label.itertext()).strip() if label is not None else ""
+            toc.append((_resolve(base, content.get("src")), text))
+    return toc
+
+
+def _resolve(base: str, href: str) -> str:
+    """Resolve an href relative to a directory inside the zip, dropping any fragment."""
+    return posixpath.normpath(posixpath.join(base, unquote(href.split("#", 1)[0])))
+
+
+def _html_text(raw: bytes) -> str:
+    """Extract readable text from an (X)HTML document, with lxml if it's installed."""
+    try:
+        import lxml.html
+    except ImportError:
+        from bs4 import BeautifulSoup
+        soup = BeautifulSoup(raw, "html.parser")
+        text = soup.get_text(separator="\n", strip=True)
+    else:
+        root = lxml.html.document_fromstring(raw)
+        for el in root.xpath("//script|//style|//head"):
+            el.drop_tree()
+        text = "\n".join(t.strip() for t in root.itertext() if t.strip())
+    return re.sub(r"\n{3,}", "\n\n", text).strip()
 
-    return chapters
 
+def _rough_text(raw: bytes) -> str:
+    """Cheaply approximate a fragment's text by stripping tags, for sizing and titles."""
+    raw = _TAG_RE.sub(b" ", _SKIP_RE.sub(b" ", raw))
+    return " ".join(html.unescape(raw.decode("utf-8", errors="replace")).split())
 
-def parse_text(path: str) -> list[dict]:
-    """Parse a plain text file into chapters."""
+
+def _local(tag: str) -> str:
+    """Strip the XML namespace from an element tag."""
+    return tag.rsplit("}", 1)[-1]
+
+
+# ── Plain text ────────────────────────────────────────────────────────────
+
+
+def _index_text(path: str) -> list[dict]:
+    """Index a text file by "Chapter N" headings, else by ~2000 character blocks."""
     with open(path, "r", encoding="utf-8", errors="replace") as f:
         text = f.read()
 
     # Try splitting by "Chapter" headings
-    parts = re.split(r"(?i)(?=^chapter\s+\d+)", text, flags=re.MULTILINE)
-    parts = [p.strip() for p in parts if p.strip()]
+    starts = [m.start() for m in re.finditer(r"(?im)^chapter\s+\d+", text)]
+    spans = list(zip([0] + starts, starts + [len(text)]))
+    spans = [(s, e) for s, e in spans if text[s:e].strip()]
 
-    if len(parts) <= 1:
+    if len(spans) <= 1:
         # Fall back to splitting by ~2000 char blocks
-        parts = _split_by_size(text, 2000)
+        spans = chunk_spans(text, 2000)
 
     chapters = []
-    for i, part in enumerate(parts):
+    for i, (start, end) in enumerate(spans):
+        part = text[start:end].strip()
         lines = part.split("\n", 1)
         title = lines[0][:80] if lines else f"Section {i + 1}"
-        chapters.append({"title": title, "content": part, "order": i})
-
+        chapters.append({"title": title, "order": i, "chars": len(part), "start": start, "end": end})
     return chapters
-
-
-def parse_file(path: str) -> list[dict]:
-    """Dispatch to the right parser based on extension."""
-    ext = os.path.splitext(path)[1].lower()
-    if ext == ".epub":
-        return parse_epub(path)
-    elif ext in (".txt", ".text"):
-        return parse_text(path)
-    else:
-        raise ValueError(f"Unsupported file type: {ext}")
-
-
-def _split_by_size(text: str, max_chars: int = 2000) -> list[str]:
-    """Split text into chunks of roughly max_chars, breaking at sentence boundaries."""
-    sentences = re.split(r"(?<=[.!?])\s+", text)
-    chunks = []
-    current = ""
-    for s in sentences:
-        if len(current) + len(s) > max_chars and current:
-            chunks.append(current.strip())
-            current = ""
-        current += s + " "
-    if current.strip():
-        chunks.append(current.strip())
-    return chunks if chunks else [text]
@@ -0,0 +1,17 @@
+import hashlib
+
+_READ_BLOCK = 1024 * 1024
+
+
+def file_sha256(path: str) -> str:
+    """Return the hex SHA-256 of a file's contents, read in blocks."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(_READ_BLOCK), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def text_sha256(text: str) -> str:
+    """Return the hex SHA-256 of a UTF-8 string."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
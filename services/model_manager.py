@@ -1,42 +1,215 @@
+import logging
 import threading
 from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable
 
-from config import MODELS
+from config import MODELS, MODEL_CACHE_BUDGET_MB, PINNED_MODELS
 
-MAX_CACHED_MODELS = 2
+logger = logging.getLogger(__name__)
+
+_MB = 1024 * 1024
+
+
+def _estimate_model_bytes(model_name: str) -> int:
+    """Estimate a model's resident size from the size metadata in config."""
+    return MODELS[model_name].get("size_mb", 1024) * _MB
+
+
+def _measure_model_bytes(model) -> int | None:
+    """Sum the parameter buffers of a loaded MLX model, or None if unavailable."""
+    try:
+        from mlx.utils import tree_flatten
+        return sum(v.nbytes for _, v in tree_flatten(model.parameters()))
+    except Exception:
+        return None
+
+
+def _load_mlx_model(model_name: str):
+    """Load a model's weights with mlx-audio (downloading them on first use)."""
+    from mlx_audio.tts.utils import load_model
+    return load_model(MODELS[model_name]["repo_id"])
 
 
 class ModelManager:
-    """Thread-safe lazy model loader with LRU eviction."""
+    """Thread-safe lazy model loader with memory-budgeted LRU eviction.
+
+    Each cached model is charged its measured parameter size (falling back to
+    the ``size_mb`` estimate in config). Before a model is loaded, least
+    recently used models are evicted until it fits in the budget. Pinned
+    models are never evicted. ``loader`` turns a model name into a model
+    object; it defaults to loading the model with mlx-audio.
+    """
 
-    def __init__(self):
+    def __init__(
+        self,
+        budget_mb: int = MODEL_CACHE_BUDGET_MB,
+        loader: Callable[[str], object] = _load_mlx_model,
+    ):
+        self._loader = loader
         self._cache: OrderedDict[str, object] = OrderedDict()
+        self._sizes: dict[str, int] = {}
+        self._pinned: set[str] = set(PINNED_MODELS)
+        self._budget = budget_mb * _MB
+        self._loading: dict[str, Future] = {}
+        self._reserved: dict[str, int] = {}
+        self._stats = {"hits": 0, "loads": 0, "deduplicated": 0, "failures": 0}
         self._lock = threading.Lock()
 
     def get_model(self, model_name: str):
-        """Return a loaded model, loading it if necessary."""
+        """Return a loaded model, loading it if necessary.
+
+        Concurrent callers asking for the same cold model share a single
+        in-flight load instead of each loading their own copy.
+        """
         with self._lock:
             if model_name in self._cache:
                 self._cache.move_to_end(model_name)
+                self._stats["hits"] += 1
                 return self._cache[model_name]
+            future = self._loading.get(model_name)
+            owner = future is None
+            if not owner:
+                self._stats["deduplicated"] += 1
+            else:
+                future = Future()
+                self._loading[model_name] = future
+                self._stats["loads"] += 1
+                # Make room up front so peak memory stays within budget
+                estimate = _estimate_model_bytes(model_name)
+                self._evict_for(estimate)
+                self._reserved[model_name] = estimate
+        if not owner:
+            return future.result()
 
         # Load outside the lock (can be slow)
-        model_cfg = MODELS[model_name]
-        from mlx_audio.tts.utils import load_model
-        model = load_model(model_cfg["repo_id"])
+        try:
+            model = self._loader(model_name)
+            size = _measure_model_bytes(model) or _estimate_model_bytes(model_name)
+        except BaseException as e:
+            with self._lock:
+                self._loading.pop(model_name, None)
+                self._reserved.pop(model_name, None)
+                self._stats["failures"] += 1
+            future.set_exception(e)
+            raise
 
         with self._lock:
-            # Evict LRU if over capacity
-            while len(self._cache) >= MAX_CACHED_MODELS:
-                evicted_name, evicted_model = self._cache.popitem(last=False)
-                del evicted_model
+            self._reserved.pop(model_name, None)
+            self._evict_for(size)
             self._cache[model_name] = model
-            return model
+            self._sizes[model_name] = size
+            self._loading.pop(model_name, None)
+        future.set_result(model)
+        return model
+
+    def preload(self, model_name: str) -> None:
+        """Start loading a model in a background thread if it isn't loaded yet.
+
+        A later get_model() call for the same model joins the in-flight load.
+        """
+        with self._lock:
+            if model_name in self._cache or model_name in self._loading:
+                return
+        threading.Thread(
+            target=self._preload, args=(model_name,),
+            name=f"preload-{model_name}", daemon=True,
+        ).start()
+
+    def _preload(self, model_name: str) -> None:
+        try:
+            self.get_model(model_name)
+        except Exception:
+            logger.exception("Background load of %s failed", model_name)
 
     def is_loaded(self, model_name: str) -> bool:
         with self._lock:
             return model_name in self._cache
 
+    def pin(self, model_name: str) -> None:
+        """Exclude a model from eviction (takes effect once it is loaded)."""
+        with self._lock:
+            self._pinned.add(model_name)
+
+    def unpin(self, model_name: str) -> None:
+        with self._lock:
+            self._pinned.discard(model_name)
+
+    def set_loader(self, loader: Callable[[str], object]) -> None:
+        """Replace the model loader (e.g. with a fake model for benchmarks).
+
+        Models already loaded stay cached; only later loads use the new loader.
+        """
+        with self._lock:
+            self._loader = loader
+
+    def set_budget(self, budget_mb: int) -> None:
+        """Change the memory ceiling, evicting immediately if now over it."""
+        with self._lock:
+            self._budget = budget_mb * _MB
+            self._evict_for(0)
+
+    def memory_usage(self) -> dict:
+        """Return the budget, bytes in use and per-model sizes (LRU first)."""
+        with self._lock:
+            return {
+                "budget_bytes": self._budget,
+                "used_bytes": sum(self._sizes.values()),
+                "models": {name: self._sizes[name] for name in self._cache},
+                "pinned": sorted(self._pinned),
+            }
+
+    def stats(self) -> dict:
+        """Return cache counters.
+
+        ``deduplicated`` counts callers that waited on another caller's
+        in-flight load instead of starting their own.
+        """
+        with self._lock:
+            return {**self._stats, "loading": sorted(self._loading)}
+
+    def count_loads(self, model_names: list[str]) -> int:
+        """Count the loads that using `model_names` in order would cause from the current cache.
+
+        Replays the sequence against the resident and in-flight models, the
+        budget and the pinned set, with estimated sizes for models not loaded
+        yet; nothing is actually loaded or evicted.
+        """
+        with self._lock:
+            resident = OrderedDict((name, self._sizes[name]) for name in self._cache)
+            resident.update(self._reserved)
+            pinned = set(self._pinned)
+            budget = self._budget
+        loads = 0
+        for name in model_names:
+            if name in resident:
+                resident.move_to_end(name)
+                continue
+            loads += 1
+            size = _estimate_model_bytes(name)
+            # Same policy as _evict_for()
+            used = sum(resident.values())
+            for other in list(resident):
+                if used + size <= budget:
+                    break
+                if other in pinned:
+                    continue
+                used -= resident.pop(other)
+            resident[name] = size
+        return loads
+
+    def _evict_for(self, needed: int) -> None:
+        """Evict LRU unpinned models until `needed` more bytes fit. Caller holds the lock."""
+        used = sum(self._sizes.values()) + sum(self._reserved.values())
+        for name in list(self._cache):
+            if used + needed <= self._budget:
+                break
+            if name in self._pinned:
+                continue
+            evicted_model = self._cache.pop(name)
+            used -= self._sizes.pop(name)
+            del evicted_model
+
 
 # Singleton
 manager = ModelManager()
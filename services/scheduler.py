@@ -0,0 +1,213 @@
+import heapq
+import itertools
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Callable, Iterator
+
+from config import SCHEDULER_AFFINITY_MAX_BYPASS, SCHEDULER_MAX_CONCURRENT
+from services.model_manager import manager
+
+# Priority classes, most urgent first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_COMPARE = 1
+PRIORITY_BATCH = 2
+
+_END = object()
+
+
+class _Job:
+    __slots__ = ("fn", "args", "kwargs", "model_name", "priority", "future")
+
+    def __init__(self, fn, args, kwargs, model_name, priority):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.model_name = model_name
+        self.priority = priority
+        self.future: Future = Future()
+
+
+class JobScheduler:
+    """Central queue for synthesis work from every tab.
+
+    Jobs are queued per model and dispatched by priority class (interactive
+    before compare before batch). Within a class, jobs for the model that ran
+    last (or another already-loaded model) go before older jobs that would
+    force a model switch, up to SCHEDULER_AFFINITY_MAX_BYPASS times in a
+    row; otherwise FIFO. At most `max_concurrent` jobs run at once. Long jobs
+    such as audiobooks are submitted one chunk at a time (a small batch for
+    models that render batches in one pass, see synthesis_batch_size()), so
+    an interactive request waits for at most one job rather than for the
+    whole book.
+    """
+
+    def __init__(self, max_concurrent: int = SCHEDULER_MAX_CONCURRENT):
+        self._max_concurrent = max(1, max_concurrent)
+        self._queues: dict[str, list] = {}
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._workers: list[threading.Thread] = []
+        self._running = 0
+        self._last_model: str | None = None
+        self._bypass_streak = 0
+        self._stats = {
+            "submitted": 0, "completed": 0, "failed": 0,
+            "affinity_picks": 0, "loads_avoided": 0,
+        }
+
+    def submit(self, model_name: str, priority: int, fn: Callable, /, *args, **kwargs) -> Future:
+        """Queue fn(*args, **kwargs) to run against `model_name`. Returns a Future for its result."""
+        job = _Job(fn, args, kwargs, model_name, priority)
+        with self._cond:
+            self._start_workers()
+            heapq.heappush(
+                self._queues.setdefault(model_name, []),
+                (priority, next(self._seq), job),
+            )
+            self._stats["submitted"] += 1
+            self._cond.notify()
+        return job.future
+
+    def submit_group(self, priority: int, jobs: list[tuple[str, Callable, tuple, dict]]) -> tuple[list[Future], int]:
+        """Submit related jobs ordered so that jobs sharing a model run back to back.
+
+        `jobs` are (model_name, fn, args, kwargs) tuples. Jobs for models that
+        are already loaded go first, the rest grouped by model in order of
+        first appearance. Returns the futures in the original job order and
+        the number of model loads saved compared to running them as given,
+        estimated from the models loaded now and the memory budget (see
+        ModelManager.count_loads()).
+        """
+        models = [job[0] for job in jobs]
+        first_seen = {}
+        for m in models:
+            first_seen.setdefault(m, len(first_seen))
+        order = sorted(
+            range(len(jobs)),
+            key=lambda i: (not manager.is_loaded(models[i]), first_seen[models[i]], i),
+        )
+
+        futures: list[Future | None] = [None] * len(jobs)
+        for i in order:
+            model_name, fn, args, kwargs = jobs[i]
+            futures[i] = self.submit(model_name, priority, fn, *args, **kwargs)
+
+        avoided = max(0, manager.count_loads(models) - manager.count_loads([models[i] for i in order]))
+        with self._cond:
+            self._stats["loads_avoided"] += avoided
+        return futures, avoided
+
+    def run(self, model_name: str, priority: int, fn: Callable, /, *args, **kwargs):
+        """Submit a job and block until its result is available."""
+        return self.submit(model_name, priority, fn, *args, **kwargs).result()
+
+    def stream(self, model_name: str, priority: int, fn: Callable, /, *args, **kwargs) -> Iterator:
+        """Run an iterator-returning fn as a job, relaying its items to the caller as they arrive.
+
+        The job holds its scheduler slot until the iterator is exhausted.
+        Closing the returned iterator early stops the job after its current item.
+        """
+        items: queue.Queue = queue.Queue()
+        cancelled = threading.Event()
+
+        def relay():
+            try:
+                for item in fn(*args, **kwargs):
+                    if cancelled.is_set():
+                        break
+                    items.put(item)
+            finally:
+                items.put(_END)
+
+        future = self.submit(model_name, priority, relay)
+        try:
+            while True:
+                item = items.get()
+                if item is _END:
+                    break
+                yield item
+            future.result()
+        finally:
+            cancelled.set()
+
+    def set_max_concurrent(self, max_concurrent: int) -> None:
+        """Change how many jobs may run at once; running jobs are not interrupted."""
+        with self._cond:
+            self._max_concurrent = max(1, max_concurrent)
+            if self._workers:
+                self._start_workers()
+            self._cond.notify_all()
+
+    def stats(self) -> dict:
+        """Return job counters, running jobs and queue depth per model."""
+        with self._cond:
+            return {
+                **self._stats,
+                "running": self._running,
+                "queued": {name: len(q) for name, q in self._queues.items() if q},
+            }
+
+    # ── Dispatch ──────────────────────────────────────────────────────────
+
+    def _start_workers(self) -> None:
+        """Start worker threads on first use. Caller holds the condition."""
+        while len(self._workers) < self._max_concurrent:
+            t = threading.Thread(
+                target=self._worker, name=f"scheduler-{len(self._workers)}", daemon=True,
+            )
+            self._workers.append(t)
+            t.start()
+
+    def _next_job(self) -> _Job:
+        """Pop the next job to run across all models. Caller holds the condition."""
+        while True:
+            heads = [(q[0][0], q[0][1], name) for name, q in self._queues.items() if q]
+            if heads and self._running < self._max_concurrent:
+                oldest = min(heads)
+                name = oldest[2]
+                if self._bypass_streak < SCHEDULER_AFFINITY_MAX_BYPASS:
+                    name = self._affine_model(heads, oldest) or name
+                if name == oldest[2]:
+                    self._bypass_streak = 0
+                else:
+                    self._bypass_streak += 1
+                    self._stats["affinity_picks"] += 1
+                self._last_model = name
+                return heapq.heappop(self._queues[name])[2]
+            self._cond.wait()
+
+    def _affine_model(self, heads: list[tuple], oldest: tuple) -> str | None:
+        """Pick a model at the most urgent priority that needs no switch, if any."""
+        candidates = sorted(h for h in heads if h[0] == oldest[0])
+        for _, _, name in candidates:
+            if name == self._last_model:
+                return name
+        for _, _, name in candidates:
+            if manager.is_loaded(name):
+                return name
+        return None
+
+    def _worker(self) -> None:
+        while True:
+            with self._cond:
+                job = self._next_job()
+                self._running += 1
+
+            if job.future.set_running_or_notify_cancel():
+                try:
+                    job.future.set_result(job.fn(*job.args, **job.kwargs))
+                except BaseException as e:
+                    job.future.set_exception(e)
+
+            with self._cond:
+                self._running -= 1
+                self._cond.notify()
+                if job.future.cancelled() or job.future.exception() is not None:
+                    self._stats["failed"] += 1
+                else:
+                    self._stats["completed"] += 1
+
+
+# Singleton
+scheduler = JobScheduler()
@@ -0,0 +1,137 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Iterable, Iterator
+
+import numpy as np
+import soundfile as sf
+
+from config import SYNTHESIS_CACHE_DIR, SYNTHESIS_CACHE_MAX_MB
+from services.hashing import text_sha256
+
+_MB = 1024 * 1024
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so trivially different inputs share a cache entry."""
+    return " ".join(text.split())
+
+
+class SynthesisCache:
+    """Thread-safe on-disk LRU cache of synthesized audio.
+
+    Entries are float WAV files named by a hash of everything that affects the
+    output (model, voice or reference audio, normalized text, speed, style).
+    File mtimes carry the LRU order across restarts; the oldest entries are
+    deleted once the cache grows past its size limit.
+    """
+
+    def __init__(self, cache_dir: str = SYNTHESIS_CACHE_DIR, max_mb: int = SYNTHESIS_CACHE_MAX_MB):
+        self._dir = cache_dir
+        self._max_bytes = max_mb * _MB
+        self._entries: OrderedDict[str, int] | None = None
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(**parts) -> str:
+        """Hash keyword parts (JSON-serializable) into a cache key."""
+        return text_sha256(json.dumps(parts, sort_keys=True))
+
+    def get(self, key: str) -> np.ndarray | None:
+        """Return cached audio for `key`, or None on a miss."""
+        with self._lock:
+            entries = self._index()
+            if key not in entries:
+                self._stats["misses"] += 1
+                return None
+            entries.move_to_end(key)
+
+        path = self._path(key)
+        try:
+            audio, _ = sf.read(path, dtype="float32")
+            os.utime(path)
+        except Exception:
+            # Removed or corrupted behind our back
+            with self._lock:
+                self._entries.pop(key, None)
+                self._stats["misses"] += 1
+            return None
+
+        with self._lock:
+            self._stats["hits"] += 1
+        return audio
+
+    def put(self, key: str, audio: np.ndarray, sample_rate: int) -> None:
+        """Store audio under `key`, evicting least recently used entries if over the limit."""
+        path = self._path(key)
+        # Per-thread temp name: concurrent writers of the same key must not share a file
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            sf.write(tmp_path, np.asarray(audio, dtype=np.float32).reshape(-1), sample_rate,
+                     format="WAV", subtype="FLOAT")
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        size = os.path.getsize(path)
+
+        with self._lock:
+            entries = self._index()
+            entries[key] = size
+            entries.move_to_end(key)
+            self._evict()
+
+    def record(self, key: str, chunks: Iterable[np.ndarray], sample_rate: int) -> Iterator[np.ndarray]:
+        """Pass chunks through unchanged, storing the full audio once they are exhausted."""
+        collected = []
+        for chunk in chunks:
+            collected.append(chunk)
+            yield chunk
+        if collected:
+            self.put(key, np.concatenate([np.asarray(c).reshape(-1) for c in collected]), sample_rate)
+
+    def stats(self) -> dict:
+        """Return hit/miss/eviction counters plus current entry count and size."""
+        with self._lock:
+            entries = self._index()
+            return {
+                **self._stats,
+                "entries": len(entries),
+                "bytes": sum(entries.values()),
+                "max_bytes": self._max_bytes,
+            }
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self._dir, f"{key}.wav")
+
+    def _index(self) -> OrderedDict[str, int]:
+        """Lazily scan the cache directory into key → size, oldest first. Caller holds the lock."""
+        if self._entries is None:
+            found = []
+            for name in os.listdir(self._dir):
+                if not name.endswith(".wav"):
+                    continue
+                st = os.stat(os.path.join(self._dir, name))
+                found.append((st.st_mtime, name[:-len(".wav")], st.st_size))
+            found.sort()
+            self._entries = OrderedDict((key, size) for _, key, size in found)
+        return self._entries
+
+    def _evict(self) -> None:
+        """Delete LRU entries until under the size limit. Caller holds the lock."""
+        total = sum(self._entries.values())
+        while total > self._max_bytes and len(self._entries) > 1:
+            key, size = self._entries.popitem(last=False)
+            total -= size
+            self._stats["evictions"] += 1
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+
+# Singleton
+synthesis_cache = SynthesisCache()
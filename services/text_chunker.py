@@ -0,0 +1,130 @@
+import re
+import unicodedata
+from typing import Iterator
+
+from config import DEFAULT_CHUNK_CHARS, MODELS
+
+# Sentence-ending punctuation plus any closing quotes/brackets. Western
+# punctuation only ends a sentence before whitespace; CJK punctuation
+# (no spaces between sentences) ends one wherever it appears.
+_BOUNDARY_RE = re.compile(
+    r"[.!?…]+[\"'”’»)\]]*(?=\s)"
+    r"|[。！？]+[」』”’）》]*"
+)
+# Where an overlong sentence may be broken, in order of preference
+_CLAUSE_RE = re.compile(r"[,;:—–](?=\s)|[，、；：]")
+_WORD_BEFORE_RE = re.compile(r"(\w+(?:\.\w+)*)$")
+_SPACE_RE = re.compile(r"\s+")
+_INLINE_SPACE_RE = re.compile(r"[^\S\n]+")
+_BLANK_LINES_RE = re.compile(r"\n\s*\n\s*")
+
+# Words that end in "." without ending the sentence
+_ABBREVIATIONS = frozenset({
+    "mr", "mrs", "ms", "dr", "prof", "sr", "jr", "st", "mt", "vs", "cf",
+    "e.g", "i.e", "fig", "vol", "approx", "inc", "ltd", "co", "gen", "col",
+    "capt", "lt", "sgt", "rev", "hon", "jan", "feb", "aug", "sept", "oct", "nov", "dec",
+})
+
+
+def chunk_chars(model_name: str) -> int:
+    """Return the chunk size (characters) that suits a model."""
+    return MODELS.get(model_name, {}).get("chunk_chars", DEFAULT_CHUNK_CHARS)
+
+
+def clean_text(text: str) -> str:
+    """Normalize text for synthesis: NFC, one space between words, paragraphs separated by one blank line."""
+    text = unicodedata.normalize("NFC", text).replace("\r\n", "\n").replace("\r", "\n")
+    text = _INLINE_SPACE_RE.sub(" ", text)
+    text = _BLANK_LINES_RE.sub("\n\n", text)
+    return "\n".join(line.strip() for line in text.split("\n")).strip()
+
+
+def split_sentences(text: str) -> list[str]:
+    """Split text into sentences, trimmed of surrounding whitespace."""
+    return [text[start:end] for start, end in sentence_spans(text)]
+
+
+def chunk_text(text: str, max_chars: int = DEFAULT_CHUNK_CHARS) -> list[str]:
+    """Split text into chunks of whole sentences of at most max_chars each.
+
+    Sentences longer than max_chars are broken at clause punctuation, then
+    at whitespace, and only as a last resort mid-word.
+    """
+    return [text[start:end] for start, end in chunk_spans(text, max_chars)]
+
+
+def chunk_spans(text: str, max_chars: int = DEFAULT_CHUNK_CHARS) -> list[tuple[int, int]]:
+    """Like chunk_text(), but return (start, end) offsets into text.
+
+    A chunk keeps the original text between its sentences, so joining the
+    slices never copies more than the input: runs in linear time.
+    """
+    max_chars = max(1, max_chars)
+    spans = []
+    chunk_start = chunk_end = None
+    for sentence_start, sentence_end in sentence_spans(text):
+        for start, end in _fit(text, sentence_start, sentence_end, max_chars):
+            if chunk_start is not None and end - chunk_start > max_chars:
+                spans.append((chunk_start, chunk_end))
+                chunk_start = None
+            if chunk_start is None:
+                chunk_start = start
+            chunk_end = end
+    if chunk_start is not None:
+        spans.append((chunk_start, chunk_end))
+    return spans
+
+
+def sentence_spans(text: str) -> Iterator[tuple[int, int]]:
+    """Yield (start, end) offsets of each sentence, trimmed of surrounding whitespace."""
+    start = 0
+    for m in _BOUNDARY_RE.finditer(text):
+        if not _ends_sentence(text, m):
+            continue
+        yield from _trimmed(text, start, m.end())
+        start = m.end()
+    yield from _trimmed(text, start, len(text))
+
+
+def _ends_sentence(text: str, m: re.Match) -> bool:
+    """Reject a "." after an abbreviation or initial, or any western stop followed by a lowercase word."""
+    punct = m.group(0)[0]
+    if punct in "。！？":
+        return True
+    word = _WORD_BEFORE_RE.search(text, max(0, m.start() - 16), m.start()) if punct == "." else None
+    if word:
+        w = word.group(1)
+        if w.lower() in _ABBREVIATIONS or (len(w) == 1 and w.isupper()):
+            return False
+    gap = _SPACE_RE.match(text, m.end())
+    following = gap.end() if gap else m.end()
+    return following >= len(text) or not text[following].islower()
+
+
+def _fit(text: str, start: int, end: int, max_chars: int) -> Iterator[tuple[int, int]]:
+    """Yield pieces of one sentence no longer than max_chars."""
+    while end - start > max_chars:
+        limit = start + max_chars
+        cut = None
+        for m in _CLAUSE_RE.finditer(text, start, limit):
+            cut = m.end()
+        if cut is None:
+            space = text.rfind(" ", start + 1, limit)
+            cut = space if space > start else limit
+        yield from _trimmed(text, start, cut)
+        start = cut
+        gap = _SPACE_RE.match(text, start)
+        if gap:
+            start = gap.end()
+    if end > start:
+        yield start, end
+
+
+def _trimmed(text: str, start: int, end: int) -> Iterator[tuple[int, int]]:
+    """Yield the span with leading/trailing whitespace removed, if anything is left."""
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    if end > start:
+        yield start, end
@@ -1,175 +1,527 @@
+import logging
 import os
+import threading
 import time
+from collections import OrderedDict
+from typing import Callable, Iterable, Iterator
+
 import numpy as np
 
 from config import (
-    MODELS, DEFAULT_SAMPLE_RATE, OUTPUT_DIR,
+    MODELS, MODEL_VOICES, DEFAULT_SAMPLE_RATE, OUTPUT_DIR, PREWARM_MODELS, SENTENCE_GAP_MS, SYNTHESIS_BATCH_SIZE,
+    VOICE_DESIGN_MODEL_NAMES, DIALOGUE_MODEL_NAMES,
     kokoro_lang_code, is_qwen3_model, is_custom_voice_model, get_sample_rate,
 )
 from services.model_manager import manager
-from services.audio_utils import save_audio, ensure_wav
+from services.scheduler import scheduler, PRIORITY_BATCH
+from services.audio_utils import save_audio, prepare_reference
+from services.text_chunker import split_sentences
+from services.synthesis_cache import synthesis_cache, normalize_text
 
+logger = logging.getLogger(__name__)
 
-def generate_speech(
+_WARMUP_TEXT = "Hello."
+
+# (model name, reference content hash) -> decoded reference waveform, LRU first
+_REFERENCE_INPUTS_MAX = 8
+_reference_inputs: OrderedDict[tuple[str, str], object] = OrderedDict()
+_reference_inputs_lock = threading.Lock()
+
+
+def stream_speech(
     text: str,
     model_name: str,
     voice: str,
     speed: float = 1.0,
     instruct: str = "",
-) -> str:
-    """Generate speech from text using a preset voice. Returns path to WAV file."""
+    use_cache: bool = True,
+    incremental: bool = False,
+) -> Iterator[np.ndarray]:
+    """Synthesize speech with a preset voice, yielding audio chunks as they are produced.
+
+    Identical requests are served from the synthesis cache as a single chunk.
+    With incremental=True the text is rendered and cached sentence by
+    sentence, so after an edit only the changed sentences are synthesized.
+    """
     if not text.strip():
         raise ValueError("Text cannot be empty.")
-
+    if incremental:
+        return _stream_sentences(
+            text, model_name,
+            lambda sentence: stream_speech(
+                sentence, model_name, voice, speed, instruct=instruct, use_cache=use_cache,
+            ),
+        )
+
+    key = None
+    if use_cache:
+        key = _speech_key(text, model_name, voice, speed, instruct)
+        cached = synthesis_cache.get(key)
+        if cached is not None:
+            return iter([cached])
+
+    kwargs = _speech_kwargs(model_name, voice, speed, instruct)
     model = manager.get_model(model_name)
-    timestamp = int(time.time() * 1000)
-    output_path = os.path.join(OUTPUT_DIR, f"tts_{timestamp}.wav")
+    return _cached_audio(key, model_name, model.generate(text=text, **kwargs))
 
-    audio_chunks = []
 
-    if model_name == "Kokoro-82M":
-        lang_code = kokoro_lang_code(voice)
-        for result in model.generate(
-            text=text,
-            voice=voice,
-            speed=speed,
-            lang_code=lang_code,
-        ):
-            audio_chunks.append(np.array(result.audio))
-
-    elif is_qwen3_model(model_name):
-        language = _qwen3_language(voice)
-        kwargs = {"text": text, "voice": voice, "language": language}
-        if instruct.strip() and is_custom_voice_model(model_name):
-            kwargs["instruct"] = instruct.strip()
-        for result in model.generate(**kwargs):
-            audio_chunks.append(np.array(result.audio))
+def generate_speech(
+    text: str,
+    model_name: str,
+    voice: str,
+    speed: float = 1.0,
+    instruct: str = "",
+    use_cache: bool = True,
+    incremental: bool = False,
+    as_array: bool = False,
+) -> str | np.ndarray:
+    """Generate speech from text using a preset voice. Returns path to WAV file.
+
+    With as_array=True the audio is returned as a float32 array instead of
+    being written to disk.
+    """
+    chunks = stream_speech(
+        text, model_name, voice, speed,
+        instruct=instruct, use_cache=use_cache, incremental=incremental,
+    )
+    if as_array:
+        return collect_audio(chunks)
+    return write_audio(chunks, model_name, "tts")
 
-    elif model_name == "CSM-1B":
-        for result in model.generate(
-            text=text,
-            voice=voice,
-            speaker=0,
-        ):
-            audio_chunks.append(np.array(result.audio))
 
-    if not audio_chunks:
-        raise RuntimeError("Model produced no audio output.")
+def generate_speech_batch(
+    texts: list[str],
+    model_name: str,
+    voice: str,
+    speed: float = 1.0,
+    instruct: str = "",
+    use_cache: bool = True,
+    incremental: bool = False,
+    as_arrays: bool = False,
+) -> list[str] | list[np.ndarray]:
+    """Generate speech for several texts with one preset voice. Returns one WAV path per text.
+
+    Texts not already in the synthesis cache are synthesized together, see
+    _synthesize_batch(). Incremental rendering goes text by text. With
+    as_arrays=True float32 arrays are returned and nothing is written.
+    """
+    if incremental:
+        return [
+            generate_speech(
+                t, model_name, voice, speed,
+                instruct=instruct, use_cache=use_cache, incremental=True, as_array=as_arrays,
+            )
+            for t in texts
+        ]
+    if any(not t.strip() for t in texts):
+        raise ValueError("Text cannot be empty.")
 
-    combined = np.concatenate(audio_chunks)
-    save_audio(combined, output_path, sample_rate=get_sample_rate(model_name))
-    return output_path
+    keys = [_speech_key(t, model_name, voice, speed, instruct) if use_cache else None for t in texts]
+    kwargs = _speech_kwargs(model_name, voice, speed, instruct)
+    return _write_batch(texts, keys, model_name, kwargs, None if as_arrays else "tts")
 
 
-def clone_voice(
+def stream_clone(
     text: str,
     model_name: str,
     ref_audio_path: str,
     ref_text: str = "",
     voice: str = "Chelsie",
     instruct: str = "",
-) -> str:
-    """Clone a voice from reference audio. Returns path to WAV file.
+    use_cache: bool = True,
+    incremental: bool = False,
+) -> Iterator[np.ndarray]:
+    """Clone a voice from reference audio, yielding audio chunks as they are produced.
 
     The voice parameter is required for CustomVoice models (base speaker name).
     It is ignored for Base and CSM models.
     The instruct parameter controls emotion/style for CustomVoice models.
+    Identical requests (same reference audio content) are served from the
+    synthesis cache as a single chunk; incremental works as in stream_speech().
     """
     if not text.strip():
         raise ValueError("Text cannot be empty.")
     if not ref_audio_path or not os.path.exists(ref_audio_path):
         raise ValueError("Reference audio file is required.")
 
-    ref_audio_path = ensure_wav(ref_audio_path)
+    # Hashed and normalized once per distinct clip, then reused across calls
+    ref_hash, ref_audio_path = prepare_reference(ref_audio_path)
+
+    if incremental:
+        return _stream_sentences(
+            text, model_name,
+            lambda sentence: stream_clone(
+                sentence, model_name, ref_audio_path, ref_text,
+                voice=voice, instruct=instruct, use_cache=use_cache,
+            ),
+        )
+
+    key = None
+    if use_cache:
+        key = _clone_key(text, model_name, ref_hash, ref_text, voice, instruct)
+        cached = synthesis_cache.get(key)
+        if cached is not None:
+            return iter([cached])
+
     model = manager.get_model(model_name)
-    timestamp = int(time.time() * 1000)
-    output_path = os.path.join(OUTPUT_DIR, f"clone_{timestamp}.wav")
+    ref_audio = _reference_input(model, model_name, ref_hash, ref_audio_path)
+    kwargs = _clone_kwargs(model_name, ref_audio, ref_text, voice, instruct)
+    return _cached_audio(key, model_name, model.generate(text=text, **kwargs))
 
-    audio_chunks = []
 
-    if is_qwen3_model(model_name):
-        kwargs = {"text": text, "ref_audio": ref_audio_path}
-        if ref_text.strip():
-            kwargs["ref_text"] = ref_text.strip()
-        if is_custom_voice_model(model_name):
-            kwargs["voice"] = voice
-            if instruct.strip():
-                kwargs["instruct"] = instruct.strip()
-        for result in model.generate(**kwargs):
-            audio_chunks.append(np.array(result.audio))
+def clone_voice(
+    text: str,
+    model_name: str,
+    ref_audio_path: str,
+    ref_text: str = "",
+    voice: str = "Chelsie",
+    instruct: str = "",
+    use_cache: bool = True,
+    incremental: bool = False,
+    as_array: bool = False,
+) -> str | np.ndarray:
+    """Clone a voice from reference audio. Returns path to WAV file.
 
-    elif model_name == "CSM-1B":
-        kwargs = {"text": text, "ref_audio": ref_audio_path, "speaker": 0}
-        if ref_text.strip():
-            kwargs["ref_text"] = ref_text.strip()
-        for result in model.generate(**kwargs):
-            audio_chunks.append(np.array(result.audio))
+    See stream_clone() for the meaning of voice, instruct and incremental,
+    and generate_speech() for as_array.
+    """
+    chunks = stream_clone(
+        text, model_name, ref_audio_path, ref_text,
+        voice=voice, instruct=instruct, use_cache=use_cache, incremental=incremental,
+    )
+    if as_array:
+        return collect_audio(chunks)
+    return write_audio(chunks, model_name, "clone")
 
-    else:
-        raise ValueError(f"Model '{model_name}' does not support voice cloning.")
 
-    if not audio_chunks:
-        raise RuntimeError("Model produced no audio output.")
+def clone_voice_batch(
+    texts: list[str],
+    model_name: str,
+    ref_audio_path: str,
+    ref_text: str = "",
+    voice: str = "Chelsie",
+    instruct: str = "",
+    use_cache: bool = True,
+    incremental: bool = False,
+    as_arrays: bool = False,
+) -> list[str] | list[np.ndarray]:
+    """Clone a voice for several texts. Returns one WAV path per text.
 
-    combined = np.concatenate(audio_chunks)
-    save_audio(combined, output_path, sample_rate=get_sample_rate(model_name))
-    return output_path
+    Batched like generate_speech_batch(); see stream_clone() for the parameters.
+    """
+    if incremental:
+        return [
+            clone_voice(
+                t, model_name, ref_audio_path, ref_text,
+                voice=voice, instruct=instruct, use_cache=use_cache, incremental=True, as_array=as_arrays,
+            )
+            for t in texts
+        ]
+    if any(not t.strip() for t in texts):
+        raise ValueError("Text cannot be empty.")
+    if not ref_audio_path or not os.path.exists(ref_audio_path):
+        raise ValueError("Reference audio file is required.")
 
+    ref_hash, ref_audio_path = prepare_reference(ref_audio_path)
+    keys = [
+        _clone_key(t, model_name, ref_hash, ref_text, voice, instruct) if use_cache else None
+        for t in texts
+    ]
+    model = manager.get_model(model_name)
+    ref_audio = _reference_input(model, model_name, ref_hash, ref_audio_path)
+    kwargs = _clone_kwargs(model_name, ref_audio, ref_text, voice, instruct)
+    return _write_batch(texts, keys, model_name, kwargs, None if as_arrays else "clone")
 
-def generate_voice_design(
+
+def stream_voice_design(
     text: str,
     model_name: str,
     language: str,
     instruct: str,
-) -> str:
-    """Generate speech with a voice designed from a text description. Returns path to WAV file."""
+) -> Iterator[np.ndarray]:
+    """Synthesize speech with a voice designed from a text description, yielding audio chunks."""
     if not text.strip():
         raise ValueError("Text cannot be empty.")
     if not instruct.strip():
         raise ValueError("Voice description cannot be empty.")
 
     model = manager.get_model(model_name)
-    timestamp = int(time.time() * 1000)
-    output_path = os.path.join(OUTPUT_DIR, f"voicedesign_{timestamp}.wav")
 
-    audio_chunks = []
     kwargs = {"text": text, "instruct": instruct}
     if language and language != "auto":
         kwargs["lang_code"] = language
 
-    for result in model.generate(**kwargs):
-        audio_chunks.append(np.array(result.audio))
+    return _iter_audio(model.generate(**kwargs))
 
-    if not audio_chunks:
-        raise RuntimeError("Model produced no audio output.")
 
-    combined = np.concatenate(audio_chunks)
-    save_audio(combined, output_path, sample_rate=get_sample_rate(model_name))
-    return output_path
+def generate_voice_design(
+    text: str,
+    model_name: str,
+    language: str,
+    instruct: str,
+) -> str:
+    """Generate speech with a voice designed from a text description. Returns path to WAV file."""
+    chunks = stream_voice_design(text, model_name, language, instruct)
+    return write_audio(chunks, model_name, "voicedesign")
 
 
-def generate_dialogue(
+def stream_dialogue(
     text: str,
     model_name: str,
-) -> str:
-    """Generate multi-speaker dialogue audio. Returns path to WAV file."""
+) -> Iterator[np.ndarray]:
+    """Synthesize multi-speaker dialogue, yielding audio chunks as they are produced."""
     if not text.strip():
         raise ValueError("Script cannot be empty.")
 
     model = manager.get_model(model_name)
+    return _iter_audio(model.generate(text=text))
+
+
+def generate_dialogue(
+    text: str,
+    model_name: str,
+) -> str:
+    """Generate multi-speaker dialogue audio. Returns path to WAV file."""
+    chunks = stream_dialogue(text, model_name)
+    return write_audio(chunks, model_name, "dialogue")
+
+
+def write_audio(chunks: Iterable[np.ndarray], model_name: str, prefix: str) -> str:
+    """Concatenate audio chunks into a new WAV file in OUTPUT_DIR. Returns its path."""
+    combined = collect_audio(chunks)
     timestamp = int(time.time() * 1000)
-    output_path = os.path.join(OUTPUT_DIR, f"dialogue_{timestamp}.wav")
+    output_path = os.path.join(OUTPUT_DIR, f"{prefix}_{timestamp}.wav")
+    save_audio(combined, output_path, sample_rate=get_sample_rate(model_name))
+    return output_path
 
-    audio_chunks = []
-    for result in model.generate(text=text):
-        audio_chunks.append(np.array(result.audio))
 
+def collect_audio(chunks: Iterable[np.ndarray]) -> np.ndarray:
+    """Concatenate audio chunks into one 1-D float32 array."""
+    audio_chunks = [np.asarray(c, dtype=np.float32).reshape(-1) for c in chunks]
     if not audio_chunks:
         raise RuntimeError("Model produced no audio output.")
+    return audio_chunks[0] if len(audio_chunks) == 1 else np.concatenate(audio_chunks)
+
+
+def _speech_key(text: str, model_name: str, voice: str, speed: float, instruct: str) -> str:
+    return synthesis_cache.make_key(
+        kind="speech",
+        model=model_name,
+        voice=voice,
+        text=normalize_text(text),
+        speed=speed,
+        instruct=instruct.strip() if is_custom_voice_model(model_name) else "",
+    )
+
+
+def _clone_key(text: str, model_name: str, ref_hash: str, ref_text: str, voice: str, instruct: str) -> str:
+    custom = is_custom_voice_model(model_name)
+    return synthesis_cache.make_key(
+        kind="clone",
+        model=model_name,
+        ref_audio=ref_hash,
+        ref_text=normalize_text(ref_text),
+        voice=voice if custom else "",
+        text=normalize_text(text),
+        instruct=instruct.strip() if custom else "",
+    )
+
+
+def _speech_kwargs(model_name: str, voice: str, speed: float, instruct: str) -> dict:
+    """Build model.generate() arguments (other than text) for a preset voice."""
+    if model_name == "Kokoro-82M":
+        return {"voice": voice, "speed": speed, "lang_code": kokoro_lang_code(voice)}
 
-    combined = np.concatenate(audio_chunks)
-    save_audio(combined, output_path, sample_rate=get_sample_rate(model_name))
-    return output_path
+    if is_qwen3_model(model_name):
+        kwargs = {"voice": voice, "language": _qwen3_language(voice)}
+        if instruct.strip() and is_custom_voice_model(model_name):
+            kwargs["instruct"] = instruct.strip()
+        return kwargs
+
+    if model_name == "CSM-1B":
+        return {"voice": voice, "speaker": 0}
+
+    raise ValueError(f"Model '{model_name}' does not support preset voices.")
+
+
+def _clone_kwargs(model_name: str, ref_audio, ref_text: str, voice: str, instruct: str) -> dict:
+    """Build model.generate() arguments (other than text) for voice cloning."""
+    if is_qwen3_model(model_name):
+        kwargs = {"ref_audio": ref_audio}
+        if ref_text.strip():
+            kwargs["ref_text"] = ref_text.strip()
+        if is_custom_voice_model(model_name):
+            kwargs["voice"] = voice
+            if instruct.strip():
+                kwargs["instruct"] = instruct.strip()
+        return kwargs
+
+    if model_name == "CSM-1B":
+        kwargs = {"ref_audio": ref_audio, "speaker": 0}
+        if ref_text.strip():
+            kwargs["ref_text"] = ref_text.strip()
+        return kwargs
+
+    raise ValueError(f"Model '{model_name}' does not support voice cloning.")
+
+
+def synthesis_batch_size(model_name: str) -> int:
+    """Return how many chunks one synthesis job for `model_name` should take.
+
+    Grouping chunks only pays off for models that render a batch in one
+    pass (batch_generate); for the rest each job is a single chunk, so an
+    interactive request never waits behind more than one chunk of a long
+    job. Loads the model if needed, so call it as a scheduler job.
+    """
+    model = manager.get_model(model_name)
+    return SYNTHESIS_BATCH_SIZE if callable(getattr(model, "batch_generate", None)) else 1
+
+
+def _write_batch(
+    texts: list[str],
+    keys: list[str | None],
+    model_name: str,
+    kwargs: dict,
+    prefix: str | None,
+) -> list[str] | list[np.ndarray]:
+    """Return audio per text, serving cache hits and synthesizing the rest in batches.
+
+    Writes one WAV per text named with `prefix`, or returns the arrays if prefix is None.
+    """
+    audio: list[np.ndarray | None] = [
+        synthesis_cache.get(key) if key is not None else None for key in keys
+    ]
+    missing = [i for i, a in enumerate(audio) if a is None]
+    if missing:
+        model = manager.get_model(model_name)
+        sample_rate = get_sample_rate(model_name)
+        for start in range(0, len(missing), SYNTHESIS_BATCH_SIZE):
+            group = missing[start:start + SYNTHESIS_BATCH_SIZE]
+            results = _synthesize_batch(model, [texts[i] for i in group], kwargs)
+            for i, result in zip(group, results):
+                audio[i] = result
+                if keys[i] is not None:
+                    synthesis_cache.put(keys[i], result, sample_rate)
+
+    if prefix is None:
+        return audio
+    return [write_audio([a], model_name, f"{prefix}_{i}") for i, a in enumerate(audio)]
+
+
+def _synthesize_batch(model, texts: list[str], kwargs: dict) -> list[np.ndarray]:
+    """Synthesize several texts with the same generate() arguments, one array per text.
+
+    Backends that expose batch_generate(texts=[...]) render the whole group
+    in one forward pass, tagging each result with the batch_idx of its text;
+    everything else gets one generate() call per text.
+    """
+    batch_generate = getattr(model, "batch_generate", None)
+    if callable(batch_generate) and len(texts) > 1:
+        parts: list[list[np.ndarray]] = [[] for _ in texts]
+        for result in batch_generate(texts=texts, **kwargs):
+            parts[result.batch_idx].append(np.array(result.audio))
+        if all(parts):
+            return [np.concatenate(p) for p in parts]
+        logger.warning("Batched generation returned no audio for some texts; retrying sequentially")
+
+    outputs = []
+    for text in texts:
+        chunks = list(_iter_audio(model.generate(text=text, **kwargs)))
+        if not chunks:
+            raise RuntimeError("Model produced no audio output.")
+        outputs.append(np.concatenate(chunks))
+    return outputs
+
+
+def _iter_audio(results) -> Iterator[np.ndarray]:
+    """Convert model generation results to numpy chunks lazily."""
+    for result in results:
+        yield np.array(result.audio)
+
+
+def _reference_input(model, model_name: str, ref_hash: str, ref_path: str):
+    """Return the reference clip decoded at the model's sample rate, decoding once per model.
+
+    mlx-audio's generate entry point hands models the decoded waveform; doing
+    that here once per clip spares every chunk of a long job from re-reading
+    and resampling the file. Falls back to the path if the loader is missing.
+    """
+    key = (model_name, ref_hash)
+    with _reference_inputs_lock:
+        if key in _reference_inputs:
+            _reference_inputs.move_to_end(key)
+            return _reference_inputs[key]
+
+    try:
+        from mlx_audio.tts.generate import load_audio
+        audio = load_audio(ref_path, sample_rate=getattr(model, "sample_rate", get_sample_rate(model_name)))
+    except (ImportError, TypeError):
+        return ref_path
+
+    with _reference_inputs_lock:
+        _reference_inputs[key] = audio
+        while len(_reference_inputs) > _REFERENCE_INPUTS_MAX:
+            _reference_inputs.popitem(last=False)
+    return audio
+
+
+def _stream_sentences(
+    text: str,
+    model_name: str,
+    render: Callable[[str], Iterator[np.ndarray]],
+) -> Iterator[np.ndarray]:
+    """Render text one sentence at a time, splicing a short gap between sentences.
+
+    Each render() call goes through the synthesis cache (unless the caller
+    passed use_cache=False), so unchanged sentences come back from disk and
+    only edited ones reach the model.
+    """
+    sentences = [s for s in split_sentences(text) if s.strip()]
+    gap = np.zeros(int(get_sample_rate(model_name) * SENTENCE_GAP_MS / 1000), dtype=np.float32)
+    for i, sentence in enumerate(sentences):
+        if i:
+            yield gap
+        yield from render(sentence)
+
+
+def _cached_audio(key: str | None, model_name: str, results) -> Iterator[np.ndarray]:
+    """Convert results to chunks, recording them in the synthesis cache under `key` if given."""
+    chunks = _iter_audio(results)
+    if key is None:
+        return chunks
+    return synthesis_cache.record(key, chunks, get_sample_rate(model_name))
+
+
+def warmup_model(model_name: str) -> None:
+    """Load a model and run a tiny synthesis so first-inference setup happens ahead of time."""
+    if model_name in VOICE_DESIGN_MODEL_NAMES:
+        path = generate_voice_design(_WARMUP_TEXT, model_name, "auto", "A calm, neutral voice.")
+    elif model_name in DIALOGUE_MODEL_NAMES:
+        path = generate_dialogue(f"[S1] {_WARMUP_TEXT}", model_name)
+    else:
+        voices = MODEL_VOICES.get(model_name) or [""]
+        path = generate_speech(_WARMUP_TEXT, model_name, voices[0], use_cache=False)
+    os.remove(path)
+
+
+def prewarm_models(model_names: list[str]) -> None:
+    """Warm up each model in turn at batch priority, logging (not raising) failures."""
+    for model_name in model_names:
+        try:
+            scheduler.run(model_name, PRIORITY_BATCH, warmup_model, model_name)
+            logger.info("Prewarmed %s", model_name)
+        except Exception:
+            logger.exception("Prewarming %s failed", model_name)
+
+
+def start_prewarm(model_names: list[str] = PREWARM_MODELS) -> threading.Thread:
+    """Prewarm models in a background daemon thread."""
+    thread = threading.Thread(
+        target=prewarm_models, args=(list(model_names),),
+        name="model-prewarm", daemon=True,
+    )
+    thread.start()
+    return thread
 
 
 def _qwen3_language(voice: str) -> str:
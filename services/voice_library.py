@@ -2,9 +2,19 @@ import json
 import os
 import re
 import shutil
+import threading
 from datetime import datetime, timezone
 
 from config import VOICES_DIR
+from services.audio_utils import prepare_reference, register_reference
+from services.hashing import file_sha256
+
+# In-memory index of the library, rebuilt when VOICES_DIR's mtime changes
+# (voices added or removed on disk) and updated in place by save/delete.
+_index_lock = threading.Lock()
+_index_mtime: int | None = None
+_by_slug: dict[str, dict] = {}
+_slug_by_name: dict[str, str] = {}
 
 
 def _slugify(name: str) -> str:
@@ -40,17 +50,39 @@ def save_voice(
     if os.path.exists(voice_dir):
         raise ValueError(f"A voice named '{name}' already exists.")
 
-    os.makedirs(voice_dir)
+    # Normalize before creating the directory so a bad file leaves nothing behind
+    _, normalized_path = prepare_reference(ref_audio_path)
+
+    with _index_lock:
+        _refresh_index()
+        os.makedirs(voice_dir)
+        manifest = _write_voice(voice_dir, slug, name, normalized_path, ref_text, model_name, base_voice)
+        _add_to_index(manifest)
+        _mark_index_current()
+
+    return manifest
+
 
-    # Copy reference audio
+def _write_voice(
+    voice_dir: str,
+    slug: str,
+    name: str,
+    normalized_path: str,
+    ref_text: str,
+    model_name: str,
+    base_voice: str,
+) -> dict:
+    """Write a voice's reference audio and manifest into its directory."""
+    # Store the already-normalized reference audio
     ref_dest = os.path.join(voice_dir, "reference.wav")
-    shutil.copy2(ref_audio_path, ref_dest)
+    shutil.copyfile(normalized_path, ref_dest)
 
     # Write manifest
     manifest = {
         "name": name.strip(),
         "slug": slug,
         "ref_text": ref_text.strip() if ref_text else "",
+        "ref_hash": file_sha256(ref_dest),
         "model": model_name,
         "base_voice": base_voice,
         "created_at": datetime.now(timezone.utc).isoformat(),
@@ -58,22 +90,14 @@ def save_voice(
     manifest_path = os.path.join(voice_dir, "voice.json")
     with open(manifest_path, "w") as f:
         json.dump(manifest, f, indent=2)
-
     return manifest
 
 
 def list_voices() -> list[dict]:
     """Return all saved voices sorted by name."""
-    voices = []
-    if not os.path.isdir(VOICES_DIR):
-        return voices
-
-    for entry in os.listdir(VOICES_DIR):
-        manifest_path = os.path.join(VOICES_DIR, entry, "voice.json")
-        if os.path.isfile(manifest_path):
-            with open(manifest_path) as f:
-                voices.append(json.load(f))
-
+    with _index_lock:
+        _refresh_index()
+        voices = [dict(v) for v in _by_slug.values()]
     voices.sort(key=lambda v: v.get("name", "").lower())
     return voices
 
@@ -83,17 +107,28 @@ def get_voice(slug: str) -> dict:
 
     Raises FileNotFoundError if the voice doesn't exist.
     """
-    voice_dir = os.path.join(VOICES_DIR, slug)
-    manifest_path = os.path.join(voice_dir, "voice.json")
+    with _index_lock:
+        _refresh_index()
+        manifest = _by_slug.get(slug)
+        if manifest is None:
+            raise FileNotFoundError(f"Voice '{slug}' not found.")
+        manifest = dict(manifest)
+
+    manifest["ref_audio_path"] = os.path.join(VOICES_DIR, slug, "reference.wav")
+    return manifest
 
-    if not os.path.isfile(manifest_path):
-        raise FileNotFoundError(f"Voice '{slug}' not found.")
 
-    with open(manifest_path) as f:
-        manifest = json.load(f)
+def find_voice(name: str) -> dict:
+    """Return a voice manifest (as get_voice) by display name.
 
-    manifest["ref_audio_path"] = os.path.join(voice_dir, "reference.wav")
-    return manifest
+    Raises FileNotFoundError if no saved voice has that name.
+    """
+    with _index_lock:
+        _refresh_index()
+        slug = _slug_by_name.get(name)
+    if slug is None:
+        raise FileNotFoundError(f"Voice '{name}' not found.")
+    return get_voice(slug)
 
 
 def delete_voice(slug: str) -> None:
@@ -102,4 +137,48 @@ def delete_voice(slug: str) -> None:
     if not os.path.isdir(voice_dir):
         raise FileNotFoundError(f"Voice '{slug}' not found.")
 
-    shutil.rmtree(voice_dir)
+    with _index_lock:
+        _refresh_index()
+        shutil.rmtree(voice_dir)
+        manifest = _by_slug.pop(slug, None)
+        if manifest and _slug_by_name.get(manifest.get("name")) == slug:
+            del _slug_by_name[manifest["name"]]
+        _mark_index_current()
+
+
+def _refresh_index() -> None:
+    """Rebuild the index if VOICES_DIR changed on disk. Caller holds _index_lock."""
+    global _index_mtime
+    try:
+        mtime = os.stat(VOICES_DIR).st_mtime_ns
+    except FileNotFoundError:
+        mtime = None
+    if mtime == _index_mtime:
+        return
+
+    _by_slug.clear()
+    _slug_by_name.clear()
+    if mtime is not None:
+        for entry in os.listdir(VOICES_DIR):
+            manifest_path = os.path.join(VOICES_DIR, entry, "voice.json")
+            if os.path.isfile(manifest_path):
+                with open(manifest_path) as f:
+                    _add_to_index(json.load(f))
+    _index_mtime = mtime
+
+
+def _mark_index_current() -> None:
+    """Record VOICES_DIR's mtime after a write-through update. Caller holds _index_lock."""
+    global _index_mtime
+    _index_mtime = os.stat(VOICES_DIR).st_mtime_ns
+
+
+def _add_to_index(manifest: dict) -> None:
+    """Index a manifest and seed the reference cache with its precomputed hash."""
+    slug = manifest["slug"]
+    _by_slug[slug] = manifest
+    _slug_by_name[manifest.get("name", "")] = slug
+    if manifest.get("ref_hash"):
+        ref_path = os.path.join(VOICES_DIR, slug, "reference.wav")
+        if os.path.isfile(ref_path):
+            register_reference(ref_path, manifest["ref_hash"])
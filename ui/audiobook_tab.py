@@ -1,14 +1,18 @@
 import os
-import time
 
 import gradio as gr
 
-from config import STANDARD_MODEL_NAMES, MODELS, MODEL_VOICES, OUTPUT_DIR, QWEN3_VOICE_LIST, SAVED_VOICE_PREFIX, TEXT_CHAR_LIMIT_WARNING, is_custom_voice_model
-from services.epub_parser import parse_file
+from config import AUDIOBOOK_FORMATS, AUDIOBOOK_PACKAGING, STANDARD_MODEL_NAMES, MODELS, MODEL_VOICES, PREDICTIVE_PRELOAD, QWEN3_VOICE_LIST, SAVED_VOICE_PREFIX, TEXT_CHAR_LIMIT_WARNING, get_sample_rate, is_custom_voice_model
+from services.audiobook_jobs import AudiobookJob
+from services.audiobook_pipeline import AudiobookPipeline
+from services.corpus_store import ingest_books
+from services.epub_parser import chapter_text, index_file
+from services.hashing import file_sha256
 from services.model_manager import manager
-from services.tts_engine import generate_speech, clone_voice
-from services.audio_utils import merge_audio_files, create_zip, maybe_convert_to_mp3
-from services.voice_library import list_voices, get_voice
+from services.scheduler import scheduler, PRIORITY_BATCH
+from services.text_chunker import chunk_chars, chunk_text
+from services.tts_engine import generate_speech_batch, clone_voice_batch, synthesis_batch_size
+from services.voice_library import list_voices, find_voice
 
 
 def _build_voice_choices(model_name: str) -> list[str]:
@@ -78,7 +82,16 @@ def create_audiobook_tab():
                 )
                 with gr.Row():
                     format_radio = gr.Radio(
-                        choices=["WAV", "MP3"], value="WAV", label="Output Format",
+                        choices=AUDIOBOOK_FORMATS, value="WAV", label="Output Format",
+                    )
+                    packaging_radio = gr.Radio(
+                        choices=AUDIOBOOK_PACKAGING, value="ZIP", label="Packaging",
+                        info="ZIP of chapter files, or one file with chapter markers",
+                    )
+                    incremental_checkbox = gr.Checkbox(
+                        value=False,
+                        label="Sentence cache",
+                        info="Render sentence by sentence so edited chapters only re-synthesize changed sentences",
                     )
                 generate_btn = gr.Button("Generate Audiobook", variant="primary")
 
@@ -88,37 +101,84 @@ def create_audiobook_tab():
                     lines=10,
                     interactive=False,
                 )
-                zip_output = gr.File(label="Download ZIP", visible=False)
+                zip_output = gr.File(label="Download Audiobook", visible=False)
 
-        # State to hold parsed chapters
+        with gr.Accordion("Bulk Ingest", open=False):
+            gr.Markdown(
+                "Parse and chunk several books in parallel into the corpus store "
+                "(`output/corpus/`), ready for batch synthesis."
+            )
+            with gr.Row():
+                bulk_upload = gr.File(
+                    label="Upload Books (.epub or .txt)",
+                    file_types=[".epub", ".txt"],
+                    file_count="multiple",
+                )
+                ingest_log = gr.Textbox(label="Ingest Status", lines=8, interactive=False)
+            ingest_btn = gr.Button("Ingest Books")
+
+        # State to hold the chapter index (no text) and the identity of the uploaded book
         chapters_state = gr.State([])
+        book_state = gr.State(None)
 
-        # Parse uploaded file
+        # Index uploaded file; chapter text is extracted on demand at generation time
         def on_file_upload(file):
             if file is None:
-                return gr.CheckboxGroup(choices=[], visible=False), []
+                return gr.CheckboxGroup(choices=[], visible=False), [], None
             try:
-                chapters = parse_file(file.name)
+                book_hash = file_sha256(file.name)
+                chapters = index_file(file.name, book_hash)
                 if not chapters:
                     gr.Warning("No chapters found in file.")
-                    return gr.CheckboxGroup(choices=[], visible=False), []
+                    return gr.CheckboxGroup(choices=[], visible=False), [], None
                 labels = [f"{ch['order']}: {ch['title']}" for ch in chapters]
+                book = {"hash": book_hash, "name": os.path.basename(file.name), "path": file.name}
                 return (
                     gr.CheckboxGroup(choices=labels, value=labels, visible=True),
                     chapters,
+                    book,
                 )
             except Exception as e:
                 gr.Error(f"Failed to parse file: {e}")
-                return gr.CheckboxGroup(choices=[], visible=False), []
+                return gr.CheckboxGroup(choices=[], visible=False), [], None
 
         file_upload.change(
             fn=on_file_upload,
             inputs=[file_upload],
-            outputs=[chapter_checkboxes, chapters_state],
+            outputs=[chapter_checkboxes, chapters_state, book_state],
+        )
+
+        # Ingest many books at once, chunked for the selected model
+        def on_ingest(files, model_name, progress=gr.Progress()):
+            if not files:
+                gr.Warning("Please upload at least one book.")
+                yield ""
+                return
+            paths = [f.name for f in files]
+            log_lines = [f"Ingesting {len(paths)} books..."]
+            yield "\n".join(log_lines)
+            for done, result in enumerate(ingest_books(paths, chunk_chars(model_name)), 1):
+                name = os.path.basename(result["path"])
+                if "error" in result:
+                    log_lines.append(f"{name}: failed ({result['error']})")
+                else:
+                    note = " (already ingested)" if result["cached"] else ""
+                    log_lines.append(
+                        f"{name}: {len(result['chapters'])} chapters, {result['chunk_count']} chunks{note}"
+                    )
+                progress(done / len(paths), desc="Ingesting books")
+                yield "\n".join(log_lines)
+
+        ingest_btn.click(
+            fn=on_ingest,
+            inputs=[bulk_upload, model_dropdown],
+            outputs=[ingest_log],
         )
 
         # Update voice choices when model changes
         def update_voices(model_name):
+            if PREDICTIVE_PRELOAD:
+                manager.preload(model_name)
             voices = _build_voice_choices(model_name)
             default = voices[0] if voices else None
             return (
@@ -137,12 +197,12 @@ def create_audiobook_tab():
         def on_voice_change(model_name, voice):
             show = _should_show_base_voice(model_name, voice)
             if show and _is_saved_voice(voice):
-                voice_name = voice[len(SAVED_VOICE_PREFIX):]
-                for v in list_voices():
-                    if v["name"] == voice_name:
-                        data = get_voice(v["slug"])
-                        stored = data.get("base_voice", QWEN3_VOICE_LIST[0])
-                        return gr.Dropdown(visible=True, value=stored)
+                try:
+                    data = find_voice(voice[len(SAVED_VOICE_PREFIX):])
+                except FileNotFoundError:
+                    return gr.Dropdown(visible=show)
+                stored = data.get("base_voice", QWEN3_VOICE_LIST[0])
+                return gr.Dropdown(visible=True, value=stored)
             return gr.Dropdown(visible=show)
 
         voice_dropdown.change(
@@ -156,17 +216,16 @@ def create_audiobook_tab():
             """Return (is_saved, voice_data_or_None)."""
             if _is_saved_voice(voice):
                 voice_name = voice[len(SAVED_VOICE_PREFIX):]
-                saved = list_voices()
-                for v in saved:
-                    if v["name"] == voice_name:
-                        return True, get_voice(v["slug"])
-                raise ValueError(f"Saved voice '{voice_name}' not found.")
+                try:
+                    return True, find_voice(voice_name)
+                except FileNotFoundError:
+                    raise ValueError(f"Saved voice '{voice_name}' not found.")
             return False, None
 
         # Generate audiobook
         def on_generate(
-            selected_labels, chapters, model_name, voice, base_voice, instruct, speed, output_format,
-            progress=gr.Progress(),
+            selected_labels, chapters, book, model_name, voice, base_voice, instruct, speed, output_format,
+            packaging, incremental, progress=gr.Progress(),
         ):
             if not selected_labels:
                 gr.Warning("Please select at least one chapter.")
@@ -188,112 +247,105 @@ def create_audiobook_tab():
                 except ValueError:
                     pass
 
-            selected_chapters = [ch for ch in chapters if ch["order"] in selected_orders]
-            if not selected_chapters:
+            selected_index = [ch for ch in chapters if ch["order"] in selected_orders]
+            if not selected_index:
                 gr.Warning("No valid chapters selected.")
                 yield "", gr.File(visible=False)
                 return
 
             # Warn about total content length
-            total_chars = sum(len(ch["content"]) for ch in selected_chapters)
+            total_chars = sum(ch["chars"] for ch in selected_index)
             if total_chars > TEXT_CHAR_LIMIT_WARNING:
                 gr.Warning(f"Total text is {total_chars:,} chars. Inputs over {TEXT_CHAR_LIMIT_WARNING:,} may be slow.")
 
-            # Pre-load model if needed
+            # Extract the selected chapters' text now that it is needed
+            try:
+                selected_chapters = [
+                    {**ch, "content": chapter_text(book["path"], book["hash"], ch["order"])}
+                    for ch in selected_index
+                ]
+            except (OSError, KeyError) as e:
+                raise gr.Error(f"Could not read chapters from the uploaded file, please upload it again: {e}")
+
+            # Pre-load model if needed, as a scheduler job so it cannot evict a model mid-job
             effective_model = model_name
             if is_saved and voice_data:
                 effective_model = voice_data.get("model", model_name)
             if not manager.is_loaded(effective_model):
                 yield f"Loading model {effective_model}...", gr.File(visible=False)
-                manager.get_model(effective_model)
+            batch_size = scheduler.run(effective_model, PRIORITY_BATCH, synthesis_batch_size, effective_model)
+
+            # Each chunk (or batch, for models that batch) is its own batch-priority
+            # job, so interactive requests from other tabs run in between
+            def synthesize_chunks(chunks):
+                if is_saved:
+                    return scheduler.run(
+                        effective_model, PRIORITY_BATCH, clone_voice_batch,
+                        chunks,
+                        voice_data.get("model", model_name),
+                        voice_data["ref_audio_path"],
+                        voice_data.get("ref_text", ""),
+                        voice=base_voice,
+                        instruct=instruct,
+                        incremental=incremental,
+                        as_arrays=True,
+                    )
+                return scheduler.run(
+                    model_name, PRIORITY_BATCH, generate_speech_batch,
+                    chunks, model_name, voice, speed,
+                    instruct=instruct, incremental=incremental, as_arrays=True,
+                )
 
-            timestamp = int(time.time())
-            chapter_paths = []
+            # Same book + same settings resumes the existing job manifest
+            settings = {
+                "model": effective_model,
+                "voice": voice,
+                "base_voice": base_voice if is_saved else None,
+                "instruct": instruct.strip(),
+                "speed": 1.0 if is_saved else speed,
+                "output_format": output_format,
+                "incremental": incremental,
+            }
+            job = AudiobookJob.open(book["hash"], book["name"], settings)
+            done_chunks, total_chunks = job.prepare(
+                selected_chapters, lambda text: chunk_text(text, chunk_chars(effective_model)),
+            )
             log_lines = []
+            if done_chunks:
+                log_lines.append(f"Resuming job {job.job_id}: {done_chunks}/{total_chunks} chunks already rendered.")
+
+            # Synthesis, writing/encoding and packaging run as overlapping stages
+            pipeline = AudiobookPipeline(
+                job, synthesize_chunks,
+                output_format=output_format, packaging=packaging,
+                sample_rate=get_sample_rate(effective_model), batch_size=batch_size,
+            )
             total = len(selected_chapters)
-            ext = "mp3" if output_format == "MP3" else "wav"
-
-            for i, ch in enumerate(progress.tqdm(selected_chapters, desc="Generating chapters")):
-                title = ch["title"]
-                log_lines.append(f"[{i+1}/{total}] Generating: {title}")
+            progress(0, desc="Generating chapters")
+            for line in pipeline.run(selected_chapters):
+                log_lines.append(line)
+                progress(pipeline.completed / total, desc="Generating chapters")
+                yield "\n".join(log_lines), gr.File(visible=False)
 
-                try:
-                    # Split long chapters into chunks
-                    content = ch["content"]
-                    chunks = _split_text(content, max_chars=2000)
-                    chunk_paths = []
-
-                    for ci, chunk in enumerate(chunks):
-                        if not chunk.strip():
-                            continue
-                        if is_saved:
-                            path = clone_voice(
-                                chunk,
-                                voice_data.get("model", model_name),
-                                voice_data["ref_audio_path"],
-                                voice_data.get("ref_text", ""),
-                                voice=base_voice,
-                                instruct=instruct,
-                            )
-                        else:
-                            path = generate_speech(chunk, model_name, voice, speed, instruct=instruct)
-                        chunk_paths.append(path)
-
-                    if chunk_paths:
-                        chapter_path = os.path.join(
-                            OUTPUT_DIR, f"audiobook_{timestamp}_ch{ch['order']:03d}.wav"
-                        )
-                        if len(chunk_paths) == 1:
-                            os.rename(chunk_paths[0], chapter_path)
-                        else:
-                            merge_audio_files(chunk_paths, chapter_path)
-                            # Clean up chunk files
-                            for cp in chunk_paths:
-                                if os.path.exists(cp):
-                                    os.remove(cp)
-                        chapter_path = maybe_convert_to_mp3(chapter_path, output_format)
-                        chapter_paths.append(chapter_path)
-                        log_lines.append(f"  Done: {title}")
-                    else:
-                        log_lines.append(f"  Skipped (empty): {title}")
-
-                except Exception as e:
-                    log_lines.append(f"  FAILED: {title} — {e}")
-                    continue
-
-            if not chapter_paths:
+            if not pipeline.chapter_paths:
                 log_lines.append("\nNo chapters were generated successfully.")
                 yield "\n".join(log_lines), gr.File(visible=False)
                 return
+            if not pipeline.package_path:
+                log_lines.append("\nPackaging failed.")
+                yield "\n".join(log_lines), gr.File(visible=False)
+                return
 
-            # Create ZIP
-            zip_path = os.path.join(OUTPUT_DIR, f"audiobook_{timestamp}.zip")
-            create_zip(chapter_paths, zip_path)
-            log_lines.append(f"\nDone! {len(chapter_paths)} chapters packaged into ZIP.")
+            log_lines.append(f"\nDone! {len(pipeline.chapter_paths)} chapters packaged into {packaging}.")
 
-            yield "\n".join(log_lines), gr.File(value=zip_path, visible=True)
+            yield "\n".join(log_lines), gr.File(value=pipeline.package_path, visible=True)
 
         generate_btn.click(
             fn=on_generate,
             inputs=[
-                chapter_checkboxes, chapters_state,
+                chapter_checkboxes, chapters_state, book_state,
                 model_dropdown, voice_dropdown, base_voice_dropdown, instruct_input, speed_slider, format_radio,
+                packaging_radio, incremental_checkbox,
             ],
             outputs=[status_log, zip_output],
         )
-
-
-def _split_text(text: str, max_chars: int = 2000) -> list[str]:
-    """Split text into chunks at sentence boundaries."""
-    import re
-    sentences = re.split(r"(?<=[.!?])\s+", text)
-    chunks = []
-    current = ""
-    for s in sentences:
-        if len(current) + len(s) > max_chars and current:
-            chunks.append(current.strip())
-            current = ""
-        current += s + " "
-    if current.strip():
-        chunks.append(current.strip())
-    return chunks if chunks else [text]
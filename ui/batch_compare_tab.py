@@ -1,10 +1,13 @@
+from concurrent.futures import FIRST_COMPLETED, wait
+
 import gradio as gr
 
-from config import STANDARD_MODEL_NAMES, MODELS, MODEL_VOICES, SAVED_VOICE_PREFIX, TEXT_CHAR_LIMIT_WARNING
-from services.audio_utils import maybe_convert_to_mp3
+from config import STANDARD_MODEL_NAMES, MODELS, MODEL_VOICES, PREDICTIVE_PRELOAD, SAVED_VOICE_PREFIX, TEXT_CHAR_LIMIT_WARNING
+from services.audio_encoder import maybe_encode
 from services.model_manager import manager
+from services.scheduler import scheduler, PRIORITY_COMPARE
 from services.tts_engine import generate_speech, clone_voice
-from services.voice_library import list_voices, get_voice
+from services.voice_library import list_voices, find_voice
 
 MAX_SLOTS = 4
 
@@ -91,6 +94,8 @@ def create_batch_compare_tab():
         # Wire model → voice dropdown updates using a factory to capture index
         def _make_model_change_handler(idx):
             def handler(model_name):
+                if PREDICTIVE_PRELOAD:
+                    manager.preload(model_name)
                 voices = _build_voice_choices(model_name)
                 default = voices[0] if voices else None
                 return gr.Dropdown(choices=voices, value=default)
@@ -103,7 +108,7 @@ def create_batch_compare_tab():
                 outputs=[voice_dropdowns[i]],
             )
 
-        # Generate all voices sequentially, yielding intermediate progress
+        # Submit all voices as one group so slots sharing a model run back to back
         def on_generate(text, n_voices, output_format, *slot_args):
             if not text.strip():
                 raise gr.Error("Please enter some text.")
@@ -124,53 +129,52 @@ def create_batch_compare_tab():
                     for j in range(MAX_SLOTS)
                 ]
 
+            slots = []
+            jobs = []
             for i in range(n):
                 model_name = models[i]
                 voice = voices[i]
 
-                # Determine effective model for saved voices
-                effective_model = model_name
-                voice_data = None
                 if _is_saved_voice(voice):
                     voice_name = voice[len(SAVED_VOICE_PREFIX):]
-                    slug = None
-                    for v in list_voices():
-                        if v["name"] == voice_name:
-                            slug = v["slug"]
-                            break
-                    if not slug:
+                    try:
+                        voice_data = find_voice(voice_name)
+                    except FileNotFoundError:
                         gr.Warning(f"Voice {i+1}: saved voice '{voice_name}' not found.")
                         continue
-                    voice_data = get_voice(slug)
+                    # Saved voices run on the model they were created with
                     effective_model = voice_data.get("model", model_name)
-
-                # Stage: Load model if needed
-                if not manager.is_loaded(effective_model):
-                    yield [gr.update(value=f"Voice {i+1}/{n}: Loading model {effective_model}...", visible=True)] + _audio_updates()
-                    manager.get_model(effective_model)
-
-                # Stage: Generate
-                yield [gr.update(value=f"Voice {i+1}/{n}: Generating audio...", visible=True)] + _audio_updates()
-
-                try:
-                    if voice_data:
-                        path = clone_voice(
-                            text,
-                            effective_model,
-                            voice_data["ref_audio_path"],
-                            voice_data.get("ref_text", ""),
-                        )
-                    else:
-                        path = generate_speech(text, model_name, voice, speed=1.0)
-
-                    # Stage: Convert if needed
-                    if output_format == "MP3":
-                        yield [gr.update(value=f"Voice {i+1}/{n}: Converting to MP3...", visible=True)] + _audio_updates()
-                        path = maybe_convert_to_mp3(path, output_format)
-
-                    results[i] = path
-                except Exception as e:
-                    gr.Warning(f"Voice {i+1} failed: {e}")
+                    jobs.append((effective_model, clone_voice, (
+                        text,
+                        effective_model,
+                        voice_data["ref_audio_path"],
+                        voice_data.get("ref_text", ""),
+                    ), {}))
+                else:
+                    jobs.append((model_name, generate_speech, (text, model_name, voice), {"speed": 1.0}))
+                slots.append(i)
+
+            futures, loads_avoided = scheduler.submit_group(PRIORITY_COMPARE, jobs)
+            note = f" ({loads_avoided} model load{'s' if loads_avoided != 1 else ''} avoided by grouping)" if loads_avoided else ""
+            yield [gr.update(value=f"Generating {len(jobs)} voices{note}...", visible=True)] + _audio_updates()
+
+            pending = dict(zip(futures, slots))
+            finished = 0
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    i = pending.pop(future)
+                    finished += 1
+                    try:
+                        path = future.result()
+                        if output_format == "MP3":
+                            path = maybe_encode(path, output_format)
+                        results[i] = path
+                    except Exception as e:
+                        gr.Warning(f"Voice {i+1} failed: {e}")
+                if pending:
+                    status = f"Voice {finished}/{len(jobs)} done{note}..."
+                    yield [gr.update(value=status, visible=True)] + _audio_updates()
 
             # Final yield: hide status, return all audio
             yield [gr.update(value="", visible=False)] + [
@@ -1,10 +1,11 @@
 import gradio as gr
 
-from config import STANDARD_MODEL_NAMES, MODELS, MODEL_VOICES, QWEN3_VOICE_LIST, SAVED_VOICE_PREFIX, TEXT_CHAR_LIMIT_WARNING, is_custom_voice_model
-from services.audio_utils import maybe_convert_to_mp3
+from config import STANDARD_MODEL_NAMES, MODELS, MODEL_VOICES, PREDICTIVE_PRELOAD, QWEN3_VOICE_LIST, SAVED_VOICE_PREFIX, TEXT_CHAR_LIMIT_WARNING, get_sample_rate, is_custom_voice_model
+from services.audio_encoder import maybe_encode
 from services.model_manager import manager
-from services.tts_engine import generate_speech, clone_voice
-from services.voice_library import list_voices, get_voice
+from services.scheduler import scheduler, PRIORITY_INTERACTIVE
+from services.tts_engine import stream_speech, stream_clone, write_audio
+from services.voice_library import list_voices, find_voice
 
 
 def _build_voice_choices(model_name: str) -> list[str]:
@@ -76,13 +77,21 @@ def create_quick_tts_tab():
                     format_radio = gr.Radio(
                         choices=["WAV", "MP3"], value="WAV", label="Output Format",
                     )
+                    incremental_checkbox = gr.Checkbox(
+                        value=False,
+                        label="Sentence cache",
+                        info="Render sentence by sentence so edits only re-synthesize changed sentences",
+                    )
                 generate_btn = gr.Button("Generate", variant="primary")
 
             with gr.Column(scale=1):
+                stream_output = gr.Audio(label="Live Playback", streaming=True, autoplay=True)
                 audio_output = gr.Audio(label="Generated Audio", type="filepath")
 
         # Update voice choices when model changes
         def update_voices(model_name):
+            if PREDICTIVE_PRELOAD:
+                manager.preload(model_name)
             voices = _build_voice_choices(model_name)
             default = voices[0] if voices else None
             return (
@@ -102,12 +111,12 @@ def create_quick_tts_tab():
             show = _should_show_base_voice(model_name, voice)
             # Default to the saved voice's stored base_voice when first shown
             if show and _is_saved_voice(voice):
-                voice_name = voice[len(SAVED_VOICE_PREFIX):]
-                for v in list_voices():
-                    if v["name"] == voice_name:
-                        data = get_voice(v["slug"])
-                        stored = data.get("base_voice", QWEN3_VOICE_LIST[0])
-                        return gr.Dropdown(visible=True, value=stored)
+                try:
+                    data = find_voice(voice[len(SAVED_VOICE_PREFIX):])
+                except FileNotFoundError:
+                    return gr.Dropdown(visible=show)
+                stored = data.get("base_voice", QWEN3_VOICE_LIST[0])
+                return gr.Dropdown(visible=True, value=stored)
             return gr.Dropdown(visible=show)
 
         voice_dropdown.change(
@@ -117,7 +126,7 @@ def create_quick_tts_tab():
         )
 
         # Generate speech
-        def on_generate(text, model_name, voice, base_voice, instruct, speed, output_format):
+        def on_generate(text, model_name, voice, base_voice, instruct, speed, output_format, incremental):
             if not text.strip():
                 raise gr.Error("Please enter some text.")
 
@@ -128,54 +137,60 @@ def create_quick_tts_tab():
             effective_model = model_name
             if _is_saved_voice(voice):
                 voice_name = voice[len(SAVED_VOICE_PREFIX):]
-                saved = list_voices()
-                slug = None
-                for v in saved:
-                    if v["name"] == voice_name:
-                        slug = v["slug"]
-                        break
-                if not slug:
+                try:
+                    voice_data = find_voice(voice_name)
+                except FileNotFoundError:
                     raise gr.Error(f"Saved voice '{voice_name}' not found.")
-                voice_data = get_voice(slug)
                 effective_model = voice_data.get("model", model_name)
 
-            # Stage 1: Load model if needed
+            # Stage 1: Load model if needed, as a scheduler job so it cannot evict a model mid-job
             if not manager.is_loaded(effective_model):
-                yield gr.update(value=f"Loading model {effective_model}...", visible=True), gr.update()
-                manager.get_model(effective_model)
-
-            # Stage 2: Generate audio
-            yield gr.update(value="Generating audio...", visible=True), gr.update()
-
-            if _is_saved_voice(voice):
-                try:
-                    path = clone_voice(
+                yield gr.update(value=f"Loading model {effective_model}...", visible=True), gr.update(), gr.update()
+                scheduler.run(effective_model, PRIORITY_INTERACTIVE, manager.get_model, effective_model)
+
+            # Stage 2: Generate audio, streaming each chunk to the player as it arrives
+            yield gr.update(value="Generating audio...", visible=True), gr.update(), gr.update()
+
+            sample_rate = get_sample_rate(effective_model)
+            chunks = []
+            try:
+                if _is_saved_voice(voice):
+                    failure = "Generation with saved voice failed"
+                    stream = scheduler.stream(
+                        effective_model, PRIORITY_INTERACTIVE, stream_clone,
                         text,
                         effective_model,
                         voice_data["ref_audio_path"],
                         voice_data.get("ref_text", ""),
                         voice=base_voice,
                         instruct=instruct,
+                        incremental=incremental,
                     )
-                except Exception as e:
-                    raise gr.Error(f"Generation with saved voice failed: {e}")
-            else:
-                try:
-                    path = generate_speech(text, model_name, voice, speed, instruct=instruct)
-                except gr.Error:
-                    raise
-                except Exception as e:
-                    raise gr.Error(f"Generation failed: {e}")
+                else:
+                    failure = "Generation failed"
+                    stream = scheduler.stream(
+                        model_name, PRIORITY_INTERACTIVE, stream_speech,
+                        text, model_name, voice, speed,
+                        instruct=instruct, incremental=incremental,
+                    )
+                for chunk in stream:
+                    chunks.append(chunk)
+                    yield gr.update(), (sample_rate, chunk), gr.update()
+                path = write_audio(chunks, effective_model, "tts")
+            except gr.Error:
+                raise
+            except Exception as e:
+                raise gr.Error(f"{failure}: {e}")
 
             # Stage 3: Convert format if needed
             if output_format == "MP3":
-                yield gr.update(value="Converting to MP3...", visible=True), gr.update()
-                path = maybe_convert_to_mp3(path, output_format)
+                yield gr.update(value="Converting to MP3...", visible=True), gr.update(), gr.update()
+                path = maybe_encode(path, output_format)
 
-            yield gr.update(value="", visible=False), path
+            yield gr.update(value="", visible=False), gr.update(), path
 
         generate_btn.click(
             fn=on_generate,
-            inputs=[text_input, model_dropdown, voice_dropdown, base_voice_dropdown, instruct_input, speed_slider, format_radio],
-            outputs=[status_text, audio_output],
+            inputs=[text_input, model_dropdown, voice_dropdown, base_voice_dropdown, instruct_input, speed_slider, format_radio, incremental_checkbox],
+            outputs=[status_text, stream_output, audio_output],
         )
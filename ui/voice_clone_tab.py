@@ -1,9 +1,10 @@
 import gradio as gr
 
-from config import CLONING_MODEL_NAMES, QWEN3_VOICE_LIST, TEXT_CHAR_LIMIT_WARNING, is_custom_voice_model
-from services.audio_utils import maybe_convert_to_mp3
+from config import CLONING_MODEL_NAMES, PREDICTIVE_PRELOAD, QWEN3_VOICE_LIST, TEXT_CHAR_LIMIT_WARNING, get_sample_rate, is_custom_voice_model
+from services.audio_encoder import maybe_encode
 from services.model_manager import manager
-from services.tts_engine import clone_voice
+from services.scheduler import scheduler, PRIORITY_INTERACTIVE
+from services.tts_engine import stream_clone, write_audio
 from services.voice_library import list_voices, get_voice, save_voice, delete_voice
 
 
@@ -74,6 +75,7 @@ def create_voice_clone_tab():
                 generate_btn = gr.Button("Generate", variant="primary")
 
             with gr.Column(scale=1):
+                stream_output = gr.Audio(label="Live Playback", streaming=True, autoplay=True)
                 audio_output = gr.Audio(label="Generated Audio", type="filepath")
 
         # ── Save Voice row ───────────────────────────────────────────────
@@ -89,6 +91,8 @@ def create_voice_clone_tab():
         # ── Handlers ─────────────────────────────────────────────────────
 
         def on_model_change(model_name):
+            if PREDICTIVE_PRELOAD:
+                manager.preload(model_name)
             visible = is_custom_voice_model(model_name)
             return gr.Dropdown(visible=visible), gr.Textbox(visible=visible)
 
@@ -164,19 +168,25 @@ def create_voice_clone_tab():
             if len(text) > TEXT_CHAR_LIMIT_WARNING:
                 gr.Warning(f"Text is {len(text):,} chars. Inputs over {TEXT_CHAR_LIMIT_WARNING:,} may be slow.")
 
-            # Stage 1: Load model if needed
+            # Stage 1: Load model if needed, as a scheduler job so it cannot evict a model mid-job
             if not manager.is_loaded(model_name):
-                yield gr.update(value=f"Loading model {model_name}...", visible=True), gr.update()
-                manager.get_model(model_name)
+                yield gr.update(value=f"Loading model {model_name}...", visible=True), gr.update(), gr.update()
+                scheduler.run(model_name, PRIORITY_INTERACTIVE, manager.get_model, model_name)
 
-            # Stage 2: Generate audio
-            yield gr.update(value="Generating audio...", visible=True), gr.update()
+            # Stage 2: Generate audio, streaming each chunk to the player as it arrives
+            yield gr.update(value="Generating audio...", visible=True), gr.update(), gr.update()
 
+            sample_rate = get_sample_rate(model_name)
+            chunks = []
             try:
-                path = clone_voice(
+                for chunk in scheduler.stream(
+                    model_name, PRIORITY_INTERACTIVE, stream_clone,
                     text, model_name, ref_audio_path, ref_text_val,
                     voice=base_voice, instruct=instruct,
-                )
+                ):
+                    chunks.append(chunk)
+                    yield gr.update(), (sample_rate, chunk), gr.update()
+                path = write_audio(chunks, model_name, "clone")
             except gr.Error:
                 raise
             except Exception as e:
@@ -184,13 +194,13 @@ def create_voice_clone_tab():
 
             # Stage 3: Convert format if needed
             if output_format == "MP3":
-                yield gr.update(value="Converting to MP3...", visible=True), gr.update()
-                path = maybe_convert_to_mp3(path, output_format)
+                yield gr.update(value="Converting to MP3...", visible=True), gr.update(), gr.update()
+                path = maybe_encode(path, output_format)
 
-            yield gr.update(value="", visible=False), path
+            yield gr.update(value="", visible=False), gr.update(), path
 
         generate_btn.click(
             fn=on_generate,
             inputs=[ref_audio, ref_text, model_dropdown, base_voice_dropdown, instruct_input, text_input, format_radio],
-            outputs=[status_text, audio_output],
+            outputs=[status_text, stream_output, audio_output],
         )
@@ -1,8 +1,9 @@
 import gradio as gr
 
 from config import VOICE_DESIGN_MODEL_NAMES, TEXT_CHAR_LIMIT_WARNING
-from services.audio_utils import maybe_convert_to_mp3
+from services.audio_encoder import maybe_encode
 from services.model_manager import manager
+from services.scheduler import scheduler, PRIORITY_INTERACTIVE
 from services.tts_engine import generate_voice_design
 
 
@@ -53,16 +54,19 @@ def create_voice_design_tab():
             if len(text) > TEXT_CHAR_LIMIT_WARNING:
                 gr.Warning(f"Text is {len(text):,} chars. Inputs over {TEXT_CHAR_LIMIT_WARNING:,} may be slow.")
 
-            # Stage 1: Load model if needed
+            # Stage 1: Load model if needed, as a scheduler job so it cannot evict a model mid-job
             if not manager.is_loaded(model_name):
                 yield gr.update(value=f"Loading model {model_name}...", visible=True), gr.update()
-                manager.get_model(model_name)
+                scheduler.run(model_name, PRIORITY_INTERACTIVE, manager.get_model, model_name)
 
             # Stage 2: Generate audio
             yield gr.update(value="Generating audio...", visible=True), gr.update()
 
             try:
-                path = generate_voice_design(text, model_name, language, instruct)
+                path = scheduler.run(
+                    model_name, PRIORITY_INTERACTIVE, generate_voice_design,
+                    text, model_name, language, instruct,
+                )
             except gr.Error:
                 raise
             except Exception as e:
@@ -71,7 +75,7 @@ def create_voice_design_tab():
             # Stage 3: Convert format if needed
             if output_format == "MP3":
                 yield gr.update(value="Converting to MP3...", visible=True), gr.update()
-                path = maybe_convert_to_mp3(path, output_format)
+                path = maybe_encode(path, output_format)
 
             yield gr.update(value="", visible=False), path
 